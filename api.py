@@ -0,0 +1,78 @@
+#----------------------------------------------------------------------------#
+# JSON API responses.
+#----------------------------------------------------------------------------#
+
+import datetime
+import gzip
+import hashlib
+import json
+
+from flask import Response, request
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+
+def json_default(value):
+  if isinstance(value, (datetime.datetime, datetime.date)):
+    return value.isoformat()
+  raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+  # Serializes data to compact UTF-8 JSON, with orjson when it is installed.
+  if orjson is not None:
+    return orjson.dumps(data, default=json_default)
+  return json.dumps(data, default=json_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def accepted_encoding():
+  # Best encoding offered by the client that we can produce, or None.
+  if brotli is not None and request.accept_encodings['br']:
+    return 'br'
+  if request.accept_encodings['gzip']:
+    return 'gzip'
+  return None
+
+
+def api_response(data):
+  # JSON response for data with a strong ETag over the uncompressed body.
+  # A matching If-None-Match gets a bodiless 304; otherwise the body is
+  # compressed with brotli or gzip when the client accepts it. Compressed
+  # variants carry the ETag suffixed with their encoding.
+  body = dumps(data)
+  etag = hashlib.sha1(body).hexdigest()
+  response = Response(mimetype='application/json')
+  response.headers['Vary'] = 'Accept-Encoding'
+  response.headers['Cache-Control'] = 'no-cache'
+
+  encoding = accepted_encoding() if len(body) >= MIN_COMPRESS_SIZE else None
+  if encoding is not None:
+    response.headers['Content-Encoding'] = encoding
+    response.set_etag(f'{etag}-{encoding}')
+  else:
+    response.set_etag(etag)
+
+  if_none_match = request.if_none_match
+  if if_none_match.star_tag or etag in {tag.split('-', 1)[0] for tag in if_none_match}:
+    response.status_code = 304
+    del response.headers['Content-Encoding']
+    return response
+
+  if encoding == 'br':
+    body = brotli.compress(body)
+  elif encoding == 'gzip':
+    body = gzip.compress(body, compresslevel=6)
+
+  response.set_data(body)
+  return response
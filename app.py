@@ -4,16 +4,29 @@
 
 import json
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
+import functools
+import babel.dates
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, make_response, stream_with_context
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
+import click
 from logging import Formatter, FileHandler
 from flask_wtf import FlaskForm, Form
-from sqlalchemy import func
-from forms import *
+from sqlalchemy import cast, event, func, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from forms import ArtistForm, ShowForm, VenueForm
 from flask_migrate import Migrate
+from config import current_config
+from pooling import engine_options, pool_stats
+from routing import RoutingSQLAlchemy
+from cache import view_cache
+from templating import init_templates
+from streaming import StreamedPage, stream_template
+from api import api_response, dumps
+from http_cache import add_cache_headers, not_modified_response
+from instrumentation import QueryInstrumentation
+from metrics import metrics
+from bulk import EXPORT_FORMATS, Importer, export_batches, export_csv, export_jsonl, export_parquet, file_format, read_rows
 import datetime
 #----------------------------------------------------------------------------#
 # App Config.
@@ -21,9 +34,12 @@ import datetime
 
 app = Flask(__name__)
 moment = Moment(app)
-app.config.from_object('config')
+app.config.from_object(current_config())
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+db = RoutingSQLAlchemy(app)
+query_instrumentation = QueryInstrumentation(app)
+metrics.init_app(app, pool_stats, view_cache)
 migrate = Migrate(app, db)
 
 # TODO: connect to a local postgresql database
@@ -38,7 +54,7 @@ class Venue(db.Model):
 
     id = db.Column(db.Integer, autoincrement=True, primary_key=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    genres = db.Column(db.PickleType, nullable=False)
+    genres = db.Column(ARRAY(db.String(120)), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
@@ -49,8 +65,21 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String(500), nullable=False)
     image_link = db.Column(db.String(500), nullable=False)
+    # Maintained by the Show events below and by 'flask roll-shows'
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Version of the venue page, see http_cache.py: bumped by every update of
+    # the row, by its shows and by edits of the artists they name
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     venue_shows = db.relationship('Show', backref='venue', lazy=True, cascade='all, delete')
 
+    __table_args__ = (
+      db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_venue_city_state', 'city', 'state'),
+      db.Index('ix_venue_name_prefix', db.text('lower(name) text_pattern_ops')),
+    )
+
     def __repr__(self):
       return f'<Venue {self.id} {self.name} {self.city}>'
 
@@ -60,7 +89,7 @@ class Artist(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.String(120))
+    genres = db.Column(ARRAY(db.String(120)))
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
@@ -69,8 +98,19 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(300))
     image_link = db.Column(db.String(500))
+    # Maintained by the Show events below and by 'flask roll-shows'
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Version of the artist page, like Venue.updated_at
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     artist_shows = db.relationship('Show', backref='artist', lazy=True, cascade='all, delete')
 
+    __table_args__ = (
+      db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_artist_name_prefix', db.text('lower(name) text_pattern_ops')),
+    )
+
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
@@ -82,18 +122,151 @@ class Show(db.Model):
   venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), nullable=False)
   artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), nullable=False)
   start_time = db.Column(db.DateTime, nullable=False)
+  # Whether the show is counted in upcoming_shows_count rather than
+  # past_shows_count; 'flask roll-shows' clears it once the show has started.
+  is_upcoming = db.Column(db.Boolean, nullable=False, server_default='false',
+    default=lambda context: context.get_current_parameters()['start_time'] > database_now(context))
+
+  __table_args__ = (
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    db.Index('ix_show_upcoming_start_time', 'start_time', postgresql_where=db.text('is_upcoming')),
+  )
+
+def database_now(context):
+  # The database's current time, in the naive local time start_time is
+  # stored in, as compared with by 'flask roll-shows' and the detail pages.
+  # The app server's clock and time zone may differ. Read once per
+  # statement, so that a batch of inserted rows costs one round trip.
+  if not hasattr(context, 'database_now'):
+    context.database_now = context.connection.scalar(select(func.localtimestamp()))
+  return context.database_now
+
+def shift_show_counters(connection, show, step):
+  # Adds step to the upcoming or past show counter of the show's venue and
+  # artist, whose pages list the show and so get a new version.
+  counter = 'upcoming_shows_count' if show.is_upcoming else 'past_shows_count'
+  for model, entity_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    table = model.__table__
+    connection.execute(table.update().where(table.c.id == entity_id)
+                       .values({counter: table.c[counter] + step, 'updated_at': func.now()}))
+
+@event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, show):
+  shift_show_counters(connection, show, 1)
+
+@event.listens_for(Show, 'after_delete')
+def uncount_deleted_show(mapper, connection, show):
+  shift_show_counters(connection, show, -1)
+
+def touch_show_partners(connection, entity, model, partner_model):
+  # Venue pages show the name and image of their artists and vice versa, so
+  # editing those bumps the updated_at of every partner sharing a show.
+  state = db.inspect(entity)
+  if not (state.attrs.name.history.has_changes() or state.attrs.image_link.history.has_changes()):
+    return
+  own_column, partner_column = (Show.venue_id, Show.artist_id) if model is Venue else (Show.artist_id, Show.venue_id)
+  partner = partner_model.__table__
+  connection.execute(partner.update()
+                     .where(partner.c.id.in_(select(partner_column).where(own_column == entity.id)))
+                     .values(updated_at=func.now()))
+
+@event.listens_for(Venue, 'after_update')
+def touch_venue_artists(mapper, connection, venue):
+  touch_show_partners(connection, venue, Venue, Artist)
+
+@event.listens_for(Artist, 'after_update')
+def touch_artist_venues(mapper, connection, artist):
+  touch_show_partners(connection, artist, Artist, Venue)
+
+#----------------------------------------------------------------------------#
+# Records.
+#----------------------------------------------------------------------------#
+
+# Column values of a new row, from a validated form. Used by the create
+# handlers and by the bulk importer.
+
+def venue_record(form):
+  return {
+    'name': form.name.data,
+    'city': form.city.data,
+    'state': form.state.data,
+    'address': form.address.data,
+    'phone': form.phone.data,
+    'genres': form.genres.data,
+    'facebook_link': form.facebook_link.data,
+    'image_link': form.image_link.data,
+    'website': form.website_link.data,
+    'seeking_talent': form.seeking_talent.data,
+    'seeking_description': form.seeking_description.data
+  }
+
+def artist_record(form):
+  return {
+    'name': form.name.data,
+    'city': form.city.data,
+    'state': form.state.data,
+    'phone': form.phone.data,
+    'genres': form.genres.data,
+    'facebook_link': form.facebook_link.data,
+    'image_link': form.image_link.data,
+    'website': form.website_link.data,
+    'seeking_venue': form.seeking_venue.data,
+    'seeking_description': form.seeking_description.data
+  }
+
+def show_record(form):
+  return {
+    'venue_id': form.venue_id.data,
+    'artist_id': form.artist_id.data,
+    'start_time': form.start_time.data
+  }
+
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+def cache_namespaces(obj):
+  # View cache namespaces whose data depends on obj. Venue and artist pages
+  # list each other's names and images, the listings show counts, and the
+  # lookups order by them.
+  if isinstance(obj, Venue):
+    return ('venues', f'venue:{obj.id}', 'artist-pages', 'shows')
+  if isinstance(obj, Artist):
+    return ('artists', f'artist:{obj.id}', 'venue-pages', 'shows')
+  if isinstance(obj, Show):
+    return ('venues', 'artists', f'venue:{obj.venue_id}', f'artist:{obj.artist_id}', 'shows')
+  return ()
+
+view_cache.init_app(app)
+view_cache.invalidate_on_commit(db.session, cache_namespaces)
+init_templates(app, view_cache)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+DATETIME_LOCALE = babel.Locale.parse('en')
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format):
+  # Compiled Babel pattern for a named format or a raw pattern string.
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+@functools.lru_cache(maxsize=4096)
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+  # Takes datetime objects directly; strings are still parsed for callers that
+  # pass them. Results are memoized, since pages repeat the same timestamps.
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=datetime.timezone.utc)
+  return datetime_pattern(format).apply(value, DATETIME_LOCALE)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
@@ -111,54 +284,133 @@ def index():
 
 @app.route('/venues')
 def venues():
-  # TODO: replace with real venues data.
-  #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-  # show_venues = Venue.query.with_entities(func.count(Venue.id), Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
-  show_venues = db.session.query(Venue.city, Venue.state).distinct()
-
-  venues_arr = []
-
-  for venue in show_venues:
-    venue = dict(zip(('city', 'state'), venue))
-    venue['venues'] = []
-    venue_req = db.session.query(Venue).filter_by(city=venue['city'], state=venue['state']).all()
-    for venue_information in venue_req:
-      venue_shows = Show.query.filter_by(venue_id=venue_information.id).all()
-      venue_information = {'id': venue_information.id, 'name': venue_information.name, 'num_upcoming_shows': len(upcoming_venue_shows(venue_shows))}
-      venue['venues'].append(venue_information)
-    venues_arr.append(venue)
-
-  return render_template('pages/venues.html', show_venues=venues_arr);
-
-@app.route('/venues/search', methods=['POST'])
+  # Pages are keyset-paginated on venue.id with ?after=<id>&limit=<n>, and can be
+  # narrowed to one genre with ?genre=<name> through the GIN index on venue.genres.
+  # The page streams, see listing_page.
+  limit = page_limit()
+  after = request.args.get('after', type=int)
+  genre = request.args.get('genre')
+  page = listing_page(('venues',), f'venues:{after}:{limit}:{genre}',
+                      lambda store: StreamedPage('areas', venues_query(after, genre), limit, lambda venue: venue.id, venue_areas, store))
+  return stream_template('pages/venues.html', limit=limit, genre=genre, page=page)
+
+def venues_page(after, limit, genre):
+  venue_rows, has_next = keyset_page(venues_query(after, genre), limit)
+  return {'areas': venue_areas(venue_rows), 'next_after': venue_rows[-1].id if has_next else None}
+
+def venues_query(after, genre):
+  # num_upcoming_shows comes from the venue's show counter.
+  query = db.session.query(
+    Venue.id,
+    Venue.name,
+    Venue.city,
+    Venue.state,
+    Venue.upcoming_shows_count.label('num_upcoming_shows')
+  ).order_by(Venue.id)
+  if after is not None:
+    query = query.filter(Venue.id > after)
+  if genre:
+    query = query.filter(has_genre(Venue, genre))
+  return query
+
+def has_genre(model, genre):
+  # Served by the GIN index on genres. The operand is cast to the column's
+  # varchar(120)[], as PostgreSQL has no varchar[] @> text[] operator.
+  return model.genres.contains(cast(array([genre]), model.genres.type))
+
+def venue_areas(venue_rows):
+  # Groups the venues by area in one pass.
+  areas = {}
+  for venue in venue_rows:
+    area = areas.get((venue.city, venue.state))
+    if area is None:
+      area = areas[(venue.city, venue.state)] = {'city': venue.city, 'state': venue.state, 'venues': []}
+    area['venues'].append({'id': venue.id, 'name': venue.name, 'num_upcoming_shows': venue.num_upcoming_shows})
+  return sorted(areas.values(), key=lambda area: (area['state'], area['city']))
+
+@app.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for Hop should return "The Musical Hop".
-  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  response={
-    'search_venue': []}
-
-  venues_search = db.session.query(Venue.name, Venue.id).all()
-
-  for venue in venues_search:
-    name = venue[0]
-    id = venue[1]
-    if name.find(request.form.get('search_term', '')) != -1:
-      venue_shows = db.session.query(Show).filter_by(venue_id=id).all()
-      venue = dict(zip(('name', 'id'), venue))
-      venue['num_upcoming_shows'] = len(upcoming_venue_shows(venue_shows))
-      response['search_venue'].append(venue)
-
-  response['count'] = len(response['venue_shows'])
+  # Partial, case-insensitive search done by PostgreSQL with ILIKE, served by the
+  # trigram index on venue.name. Results are keyset-paginated on (name, id)
+  # with ?after=<id of the last venue shown>.
+  search_term, after = search_args(request.values)
+  return render_template('pages/search_venues.html', search_term=search_term, **search_page(Venue, search_term, after))
+
+def search_args(values):
+  return values.get('search_term', '').strip(), values.get('after', type=int)
+
+def search_page(model, search_term, after):
+  # One row past the page tells whether there is a next. The count stops at
+  # SEARCH_COUNT_LIMIT matches, so a common term does not read them all.
+  rows = db.session.execute(search_statement(model, search_term, after)).all()
+  return search_results(rows, db.session.scalar(search_count_statement(model, search_term)))
+
+def search_filter(model, search_term):
+  # Terms shorter than a trigram can't use the trigram index: they are
+  # matched against every name, though only one page of them is sorted.
+  return model.name.ilike(search_pattern(search_term), escape='\\')
+
+def search_count_statement(model, search_term):
+  matches = select(model.id).where(search_filter(model, search_term)).limit(app.config['SEARCH_COUNT_LIMIT'])
+  return select(func.count()).select_from(matches.subquery())
+
+def search_statement(model, search_term, after):
+  statement = select(model.id, model.name, model.upcoming_shows_count.label('num_upcoming_shows')) \
+    .where(search_filter(model, search_term)) \
+    .order_by(model.name, model.id) \
+    .limit(app.config['SEARCH_PAGE_SIZE'] + 1)
+  if after is not None:
+    after_name = select(model.name).where(model.id == after).scalar_subquery()
+    statement = statement.where(tuple_(model.name, model.id) > tuple_(after_name, after))
+  return statement
+
+def search_results(rows, count):
+  page_size = app.config['SEARCH_PAGE_SIZE']
+  response = {
+    'count': count,
+    'data': [{'id': row.id, 'name': row.name, 'num_upcoming_shows': row.num_upcoming_shows} for row in rows[:page_size]]
+  }
 
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  return {'results': response, 'next_after': rows[page_size - 1].id if len(rows) > page_size else None}
 
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
+  # shows the venue page with the given venue_id. A client or CDN holding the
+  # current version gets a 304 after a primary key lookup, see http_cache.py.
+  key = f'venue-{venue_id}'
+  response = not_modified_response(key, entity_version(Venue, venue_id))
+  if response is not None:
+    return response
+  past_before = request.args.get('past_before')
+  data = cached_venue_page(venue_id, past_before)
+  response = make_response(render_template('pages/show_venue.html', venue=data, past_before=past_before))
+  return add_cache_headers(response, key, data['updated_at'], page_surrogate_keys(key, data, 'artist'))
+
+def entity_version(model, entity_id):
+  # updated_at of the venue or artist, read before anything is rendered.
+  updated_at = db.session.query(model.updated_at).filter(model.id == entity_id).scalar()
+  if updated_at is None:
+    abort(404)
+  return updated_at
+
+def page_surrogate_keys(key, data, partner):
+  # The page's own key, then those of the artists (or venues) its shows name.
+  partner_ids = {show[f'{partner}_id'] for show in data['past_shows'] + data['upcoming_shows']}
+  return [key] + [f'{partner}-{partner_id}' for partner_id in sorted(partner_ids)]
+
+def cached_venue_page(venue_id, past_before):
+  return view_cache.cached((f'venue:{venue_id}', 'venue-pages'), f'venue:{venue_id}:{past_before}',
+                           lambda: venue_page(venue_id, past_before))
+
+def venue_page(venue_id, past_before):
+  # ?past_before=<cursor> pages back through the venue's past shows.
+  before = parse_show_cursor(past_before) if past_before is not None else None
   venue = db.session.query(Venue).filter_by(id=venue_id).first()
-  venue_shows = db.session.query(Show).filter_by(venue_id=venue_id).all()
+  if venue is None:
+    abort(404)
+  return venue_details(venue, *entity_shows(Show.venue_id == venue_id, before))
+
+def venue_details(venue, past_shows, upcoming_shows, next_past_before):
   data = {
     'id': venue.id,
     'name': venue.name,
@@ -172,13 +424,15 @@ def show_venue(venue_id):
     'seeking_talent': venue.seeking_talent,
     'seeking_description': venue.seeking_description,
     'image_link': venue.image_link,
-    'past_shows': past_venue_shows(venue_shows),
-    'upcoming_shows': upcoming_venue_shows(venue_shows),
-    'past_shows_count': len(past_venue_shows(venue_shows)),
-    'upcoming_shows_count': len(upcoming_venue_shows(venue_shows))
+    'past_shows': past_shows,
+    'upcoming_shows': upcoming_shows,
+    'next_past_before': next_past_before,
+    'past_shows_count': venue.past_shows_count,
+    'upcoming_shows_count': venue.upcoming_shows_count,
+    'updated_at': venue.updated_at
   }
 
-  return render_template('pages/show_venue.html', venue=data)
+  return data
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -195,19 +449,7 @@ def create_venue_submission():
   # TODO: modify data to be the data object returned from db insertion
   
   try:
-    venue = Venue(
-      name = form.name.data,
-      city = form.city.data,
-      state = form.state.data,
-      address = form.address.data,
-      phone = form.phone.data,
-      genres = form.genres.data,
-      facebook_link = form.facebook_link.data,
-      image_link = form.image_link.data,
-      website = form.website_link.data,
-      seeking_talent = form.seeking_talent.data,
-      seeking_description = form.seeking_description.data
-    )
+    venue = Venue(**venue_record(form))
 
     db.session.add(venue)
     db.session.commit()
@@ -240,8 +482,7 @@ def delete_venue(venue_id):
     db.session.delete(show_venue)
     db.session.commit()
     flash('The venue was successfully deleted. Redirecting back to venues page')
-    return render_template('pages/venues.html')
-  
+
   except ValueError as err:
     print(err)
     db.session.rollback()
@@ -259,48 +500,66 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-  # TODO: replace with real data returned from querying the database
-  artist_data = []
-  artists = db.session.query(Artist.id, Artist.name).all()
-  for artist in artists:
-    artist = dict(zip(('id', 'name'), artist))
-    artist_data.append(artist)
-
-  return render_template('pages/artists.html', artists=artist_data)
-
-@app.route('/artists/search', methods=['POST'])
+  # Pages are keyset-paginated on artist.id with ?after=<id>&limit=<n>, and can be
+  # narrowed to one genre with ?genre=<name> through the GIN index on artist.genres.
+  limit = page_limit()
+  after = request.args.get('after', type=int)
+  genre = request.args.get('genre')
+  page = listing_page(('artists',), f'artists:{after}:{limit}:{genre}',
+                      lambda store: StreamedPage('artists', artists_query(after, genre), limit, lambda artist: artist.id, artist_items, store))
+  return stream_template('pages/artists.html', limit=limit, genre=genre, page=page)
+
+def artists_page(after, limit, genre):
+  artists, has_next = keyset_page(artists_query(after, genre), limit)
+  return {'artists': list(artist_items(artists)), 'next_after': artists[-1].id if has_next else None}
+
+def artists_query(after, genre):
+  query = db.session.query(Artist.id, Artist.name).order_by(Artist.id)
+  if after is not None:
+    query = query.filter(Artist.id > after)
+  if genre:
+    query = query.filter(has_genre(Artist, genre))
+  return query
+
+def artist_items(artist_rows):
+  for artist in artist_rows:
+    yield dict(zip(('id', 'name'), artist))
+
+@app.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-  # search for "band" should return "The Wild Sax Band".
-  response = {
-    'artist_search': []
-  }
-
-  artists = db.session.query(Artist.id, Artist.name).all()
-
-  for artist in artists:
-    id = artist[0]
-    name = artist[1]
-    if name.find(request.form.get('search_term', '')) != -1:
-      show_artist = db.session.query(Artist).filter_by(artist_id=id).all()
-      artist = dict(zip(('id', 'name'), artist))
-      artist['num_upcoming_shows'] = len(upcoming_venue_shows(show_artist))
-      response['artist_search'].append(artist)
-  response['count'] = len(response['artist_search'])
-  
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  # Partial, case-insensitive search on artist.name, like search_venues.
+  search_term, after = search_args(request.values)
+  return render_template('pages/search_artists.html', search_term=search_term, **search_page(Artist, search_term, after))
 
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-  # shows the artist page with the given artist_id
-  # TODO: replace with real artist data from the artist table, using artist_id
+  # shows the artist page with the given artist_id, answering conditional
+  # requests like show_venue
+  key = f'artist-{artist_id}'
+  response = not_modified_response(key, entity_version(Artist, artist_id))
+  if response is not None:
+    return response
+  past_before = request.args.get('past_before')
+  data = cached_artist_page(artist_id, past_before)
+  response = make_response(render_template('pages/show_artist.html', artist=data, past_before=past_before))
+  return add_cache_headers(response, key, data['updated_at'], page_surrogate_keys(key, data, 'venue'))
+
+def cached_artist_page(artist_id, past_before):
+  return view_cache.cached((f'artist:{artist_id}', 'artist-pages'), f'artist:{artist_id}:{past_before}',
+                           lambda: artist_page(artist_id, past_before))
+
+def artist_page(artist_id, past_before):
+  before = parse_show_cursor(past_before) if past_before is not None else None
   artist = db.session.query(Artist).filter_by(id=artist_id).first()
-  show_artist = db.session.query(Show).filter_by(artist_id=artist_id).all()
+  if artist is None:
+    abort(404)
+  return artist_details(artist, *entity_shows(Show.artist_id == artist_id, before))
+
+def artist_details(artist, past_shows, upcoming_shows, next_past_before):
   data1 = {
     "id": artist.id,
     "name": artist.name,
-    "genres": ''.join(list(filter(lambda x : x != '{' and x != '}', artist.genres ))).split(','),
+    "genres": artist.genres or [],
     "city": artist.city,
     "state": artist.state,
     "phone": artist.phone,
@@ -309,12 +568,14 @@ def show_artist(artist_id):
     "seeking_venue": artist.seeking_venue,
     "seeking_description": artist.seeking_description,
     "image_link": artist.image_link,
-    "past_shows": past_venue_shows(show_artist),
-    "upcoming_shows": upcoming_venue_shows(show_artist),
-    "past_shows_count": len(upcoming_venue_shows(show_artist)),
-    "upcoming_shows_count": len(past_venue_shows(show_artist)),
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "next_past_before": next_past_before,
+    "past_shows_count": artist.past_shows_count,
+    "upcoming_shows_count": artist.upcoming_shows_count,
+    "updated_at": artist.updated_at,
   }
-  return render_template('pages/show_artist.html', artist=data1)
+  return data1
 
 #  Update
 #  ----------------------------------------------------------------
@@ -406,7 +667,7 @@ def create_artist_submission():
   forms = ArtistForm(request.form)
 
   try:
-    show_artist = Artist(name=forms.name.data, city=forms.city.data, state=forms.state.data, phone=forms.phone.data, genres=forms.genres.data, facebook_link=forms.facebook_link.data, image_link=forms.image_link.data, website=forms.website_link.data, seeking_venue=forms.seeking_venue.data, seeking_description=forms.seeking_description.data)
+    show_artist = Artist(**artist_record(forms))
     db.session.add(show_artist)
     db.session.commit()
     # on successful db insert, flash success
@@ -430,20 +691,41 @@ def create_artist_submission():
 
 @app.route('/shows')
 def shows():
-  # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  music_shows = db.session.query(Show).all()
-  show_data = []
-
-  for show in music_shows:
-    show = {'venue_id': show.venue_id,
-    'venue_name': db.session.query(Venue.name).filter_by(id=show.venue_id).first()[0],
-    'artist_id': show.artist_id,
-    'artist_image_link': db.session.query(Artist.image_link).filter_by(id=show.artist_id).first()[0],
-    'start_time': str(show.start_time)}
-  
-    show_data.append(show)
-  return render_template('pages/shows.html', shows=show_data)
+  # displays list of shows at /shows, keyset-paginated on (start_time, id)
+  # with ?after=<start_time>_<id>&limit=<n>.
+  limit = page_limit()
+  after = request.args.get('after')
+  after_cursor = parse_show_cursor(after) if after is not None else None
+  page = listing_page(('shows',), f'shows:{after}:{limit}',
+                      lambda store: StreamedPage('shows', shows_query(after_cursor), limit, show_cursor, show_items, store))
+  return stream_template('pages/shows.html', limit=limit, page=page)
+
+def shows_page(after, limit):
+  show_rows, has_next = keyset_page(shows_query(after), limit)
+  return {
+    'shows': list(show_items(show_rows)),
+    'next_after': show_cursor(show_rows[-1]) if has_next else None
+  }
+
+def shows_query(after):
+  query = db.session.query(
+    Show.id,
+    Show.start_time,
+    Show.venue_id,
+    Venue.name.label('venue_name'),
+    Show.artist_id,
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link')
+  ).join(Venue, Venue.id == Show.venue_id) \
+    .join(Artist, Artist.id == Show.artist_id) \
+    .order_by(Show.start_time, Show.id)
+  if after is not None:
+    query = query.filter(tuple_(Show.start_time, Show.id) > after)
+  return query
+
+def show_items(show_rows):
+  for show in show_rows:
+    yield dict(show._mapping)
 
 @app.route('/shows/create')
 def create_shows():
@@ -455,14 +737,13 @@ def create_shows():
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   # TODO: insert form data as a new Show record in the db, instead
-  form = ShowForm()
+  form = ShowForm(request.form)
+  if not form.validate():
+    # an artist or venue name typed without picking a suggestion, say
+    return render_template('forms/new_show.html', form=form)
 
   try:
-    events = Show(
-      venue_id = form.venue_id.data,
-      artist_id = form.artist_id.data,
-      start_time = form.start_time.data,
-      )
+    events = Show(**show_record(form))
     
     db.session.add(events)
     db.session.commit()
@@ -481,41 +762,222 @@ def create_show_submission():
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return render_template('pages/home.html')
 
+#  API
+#  ----------------------------------------------------------------
+#  JSON over the same data as the HTML pages, with the same query
+#  parameters. See api.py for the ETag and compression handling.
+
+@app.route('/api/v1/venues')
+def api_venues():
+  limit = page_limit()
+  after = request.args.get('after', type=int)
+  genre = request.args.get('genre')
+  page = view_cache.cached(('venues',), f'venues:{after}:{limit}:{genre}', lambda: venues_page(after, limit, genre))
+  return api_response(page)
+
+@app.route('/api/v1/venues/search')
+def api_search_venues():
+  return api_response(search_page(Venue, *search_args(request.args)))
+
+@app.route('/api/v1/venues/lookup')
+def api_venue_lookup():
+  # Typeahead suggestions for the show form, ?q=<start of the name>.
+  return api_response(lookup_page(Venue, 'venues', request.args.get('q', '')))
+
+@app.route('/api/v1/venues/<int:venue_id>')
+def api_show_venue(venue_id):
+  return api_response(cached_venue_page(venue_id, request.args.get('past_before')))
+
+@app.route('/api/v1/artists')
+def api_artists():
+  limit = page_limit()
+  after = request.args.get('after', type=int)
+  genre = request.args.get('genre')
+  page = view_cache.cached(('artists',), f'artists:{after}:{limit}:{genre}', lambda: artists_page(after, limit, genre))
+  return api_response(page)
+
+@app.route('/api/v1/artists/search')
+def api_search_artists():
+  return api_response(search_page(Artist, *search_args(request.args)))
+
+@app.route('/api/v1/artists/lookup')
+def api_artist_lookup():
+  return api_response(lookup_page(Artist, 'artists', request.args.get('q', '')))
+
+@app.route('/api/v1/artists/<int:artist_id>')
+def api_show_artist(artist_id):
+  return api_response(cached_artist_page(artist_id, request.args.get('past_before')))
+
+def lookup_page(model, namespace, prefix):
+  # The venues or artists whose name starts with prefix, the busiest first.
+  # Cached per prefix: a typeahead asks for the same few prefixes over and over.
+  prefix = prefix.strip().lower()[:LOOKUP_PREFIX_LENGTH]
+  if not prefix:
+    return {'results': []}
+  return view_cache.cached((namespace,), f'{namespace}-lookup:{prefix}',
+                           lambda: {'results': [dict(row._mapping) for row in lookup_query(model, prefix)]})
+
+def lookup_query(model, prefix):
+  # Served by the ix_<table>_name_prefix index on lower(name).
+  return db.session.query(model.id, model.name, model.city, model.state) \
+    .filter(func.lower(model.name).like(prefix_pattern(prefix), escape='\\')) \
+    .order_by(model.upcoming_shows_count.desc(), model.name, model.id) \
+    .limit(app.config['LOOKUP_LIMIT'])
+
+@app.route('/api/v1/shows')
+def api_shows():
+  limit = page_limit()
+  after = request.args.get('after')
+  after_cursor = parse_show_cursor(after) if after is not None else None
+  return api_response(view_cache.cached(('shows',), f'shows:{after}:{limit}', lambda: shows_page(after_cursor, limit)))
+
+@app.route('/api/v1/export/<table>')
+def api_export(table):
+  # Streams a whole table as CSV or JSON Lines (?format=), straight from a
+  # server-side cursor. Parquet is only available from 'flask export'.
+  if table not in BULK_TABLES:
+    abort(404)
+  fmt = request.args.get('format', 'csv')
+  if fmt not in ('csv', 'jsonl'):
+    abort(400)
+  model = BULK_TABLES[table][0]
+  batches = export_batches(db.session, model.__table__)
+  if fmt == 'csv':
+    chunks, mimetype = export_csv(model.__table__, batches), 'text/csv'
+  else:
+    chunks, mimetype = export_jsonl(batches, dumps), 'application/x-ndjson'
+  response = Response(stream_with_context(chunks), mimetype=mimetype)
+  response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+  return response
+
+#  Stats
+#  ----------------------------------------------------------------
+
+@app.route('/stats/pool')
+def pool_stats_view():
+  # Connection pool usage of this worker process.
+  return jsonify(pool_stats.snapshot())
+
+@app.route('/stats/cache')
+def cache_stats_view():
+  # View cache hits and misses of this worker process.
+  return jsonify(view_cache.stats())
+
+@app.route('/metrics')
+def metrics_view():
+  # Prometheus metrics of every worker process, see metrics.py.
+  return metrics.response()
+
 @app.errorhandler(404)
 def not_found_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'not found'}), 404
     return render_template('errors/404.html'), 404
 
 @app.errorhandler(500)
 def server_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'server error'}), 500
     return render_template('errors/500.html'), 500
 
-def upcoming_venue_shows(venue_shows):
-  upcoming_venue_shows = []
-
-  for venue_show in venue_shows:
-    if venue_show.start_time > datetime.now():
-      upcoming_venue_shows.append({
-        'artist_id': venue_show.artist_id,
-        'artist_name': db.session.query(Artist).filter_by(id=venue_show.artist_id).first().name,
-        'artist_image_link': db.session.query(Artist).filter_by(id=venue_show.artist_id).first().image_link,
-        'start_time': format_datetime(str(venue_show.start_time))
-      })
-  
-  return upcoming_venue_shows
-
-def past_venue_shows(venue_shows):
-  past_venues = []
-
-  for venue_show in venue_shows:
-    if venue_show.start_time < datetime.now():
-      past_venues.append({
-        'artist_id': venue_show.artist_id,
-        'artist_name': db.session.query(Artist).filter_by(id=venue_show.artist_id).first().name,
-        'artist_image_link': db.session.query(Artist).filter_by(id=venue_show.artist_id).first().image_link,
-        'start_time': format_datetime(str(venue_show.start_time))
-      })
-
-  return past_venues
+# Longest name prefix a lookup matches on; longer ones are cut
+LOOKUP_PREFIX_LENGTH = 50
+
+def page_limit():
+  # Page size requested with ?limit=, clamped to MAX_PAGE_SIZE.
+  limit = request.args.get('limit', app.config['PAGE_SIZE'], type=int)
+  return min(max(limit, 1), app.config['MAX_PAGE_SIZE'])
+
+def keyset_page(query, limit):
+  # Fetches one row past the page to know whether a next page exists.
+  rows = query.limit(limit + 1).all()
+  return rows[:limit], len(rows) > limit
+
+def listing_page(namespaces, key, streamed_page):
+  # The cached page dict of a listing, or a StreamedPage from
+  # streamed_page(store) that renders the rows as they are fetched and
+  # stores the page in the view cache once complete. Either way a request
+  # holds at most one page, however large the table.
+  if view_cache.backend is None:
+    return streamed_page(None)
+  versioned_key, page = view_cache.lookup(namespaces, key)
+  if page is None:
+    page = streamed_page(lambda complete: view_cache.store(namespaces, versioned_key, complete))
+  return page
+
+def show_cursor(show):
+  # Keyset cursor for a show, as used in /shows?after=.
+  return f'{show.start_time.isoformat()}_{show.id}'
+
+def parse_show_cursor(cursor):
+  try:
+    start_time, show_id = cursor.rsplit('_', 1)
+    return datetime.datetime.fromisoformat(start_time), int(show_id)
+  except ValueError:
+    abort(400)
+
+def escape_like(term):
+  # term with its LIKE wildcards escaped, for patterns matched with escape='\\'.
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_pattern(search_term):
+  # ILIKE pattern matching search_term anywhere, with its wildcards escaped.
+  return f'%{escape_like(search_term)}%'
+
+def prefix_pattern(prefix):
+  # LIKE pattern matching the strings that start with prefix.
+  return f'{escape_like(prefix)}%'
+
+def entity_shows(criterion, before):
+  # (past, upcoming, next_past_before) shows of a venue or an artist page,
+  # criterion selecting them (Show.venue_id == venue_id). Only a page of
+  # each side is loaded, however many shows the entity has had.
+  upcoming = db.session.execute(upcoming_shows_statement(criterion)).all()
+  past = db.session.execute(past_shows_statement(criterion, before)).all()
+  return detail_show_lists(past, upcoming)
+
+def upcoming_shows_statement(criterion):
+  # The soonest UPCOMING_SHOWS_LIMIT shows still to start. Like 'flask
+  # roll-shows', the split compares start_time with the database's clock.
+  return show_details(criterion, Show.start_time > func.now()) \
+    .order_by(Show.start_time, Show.id).limit(app.config['UPCOMING_SHOWS_LIMIT'])
+
+def past_shows_statement(criterion, before):
+  # One page of past shows, the most recent first, before the (start_time,
+  # id) cursor before; one row more tells whether an earlier page exists.
+  statement = show_details(criterion, Show.start_time <= func.now()) \
+    .order_by(Show.start_time.desc(), Show.id.desc()).limit(app.config['PAST_SHOWS_PAGE_SIZE'] + 1)
+  if before is not None:
+    statement = statement.where(tuple_(Show.start_time, Show.id) < before)
+  return statement
+
+def show_details(*criteria):
+  # Shows with their artist and venue names, in one joined query served by
+  # the ix_show_venue_id_start_time or ix_show_artist_id_start_time index.
+  return select(
+    Show.id,
+    Show.artist_id,
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link'),
+    Show.venue_id,
+    Venue.name.label('venue_name'),
+    Venue.image_link.label('venue_image_link'),
+    Show.start_time
+  ).join(Artist, Artist.id == Show.artist_id).join(Venue, Venue.id == Show.venue_id).where(*criteria)
+
+def detail_show_lists(past_rows, upcoming_rows):
+  # Projects the rows of past_shows_statement and upcoming_shows_statement
+  # into the dicts of the detail pages.
+  page_size = app.config['PAST_SHOWS_PAGE_SIZE']
+  next_past_before = show_cursor(past_rows[page_size - 1]) if len(past_rows) > page_size else None
+  return ([show_detail(show) for show in past_rows[:page_size]],
+          [show_detail(show) for show in upcoming_rows],
+          next_past_before)
+
+def show_detail(show):
+  detail = dict(show._mapping)
+  del detail['id']
+  return detail
 
 
 if not app.debug:
@@ -528,6 +990,180 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('check-indexes')
+def check_indexes():
+  # Runs EXPLAIN on the hot queries and fails if any of them cannot be served
+  # by an index. Sequential scans are disabled for the check, so that small
+  # development tables still report the plan PostgreSQL would pick at scale.
+  hot_queries = {
+    'venue upcoming shows': upcoming_shows_statement(Show.venue_id == 1),
+    'venue past shows': past_shows_statement(Show.venue_id == 1, None),
+    'artist upcoming shows': upcoming_shows_statement(Show.artist_id == 1),
+    'artist past shows': past_shows_statement(Show.artist_id == 1, None),
+    'shows listing': db.session.query(Show.id).order_by(Show.start_time, Show.id).limit(50).statement,
+    'venues in area': db.session.query(Venue.id).filter(Venue.city == 'San Francisco', Venue.state == 'CA').statement,
+    'artist lookup': lookup_query(Artist, 'the').statement,
+    'venues by genre': db.session.query(Venue.id).filter(has_genre(Venue, 'Jazz')).statement,
+    'artists by genre': db.session.query(Artist.id).filter(has_genre(Artist, 'Jazz')).statement,
+  }
+  failed = False
+  db.session.execute('SET LOCAL enable_seqscan = off')
+  for name, query in hot_queries.items():
+    statement = query.compile(db.engine, compile_kwargs={'literal_binds': True})
+    plan = '\n'.join(row[0] for row in db.session.execute(f'EXPLAIN {statement}'))
+    uses_index = 'Seq Scan' not in plan
+    failed = failed or not uses_index
+    click.echo(f'{name}: {"index scan" if uses_index else "SEQUENTIAL SCAN"}')
+    click.echo(plan)
+  db.session.rollback()
+  if failed:
+    raise click.ClickException('some hot queries are not served by an index')
+
+# Moves the shows that have started from the upcoming to the past counters of
+# their venue and artist, in one statement. Their pages list the show under
+# past shows from then on, so they get a new version.
+ROLL_SHOWS_SQL = '''
+WITH rolled AS (
+  UPDATE show SET is_upcoming = false
+  WHERE is_upcoming AND start_time <= now()
+  RETURNING venue_id, artist_id
+), venues_rolled AS (
+  UPDATE venue SET upcoming_shows_count = upcoming_shows_count - rolled_venue.shows,
+    past_shows_count = past_shows_count + rolled_venue.shows, updated_at = now()
+  FROM (SELECT venue_id, count(*) AS shows FROM rolled GROUP BY venue_id) AS rolled_venue
+  WHERE venue.id = rolled_venue.venue_id
+  RETURNING venue.id
+), artists_rolled AS (
+  UPDATE artist SET upcoming_shows_count = upcoming_shows_count - rolled_artist.shows,
+    past_shows_count = past_shows_count + rolled_artist.shows, updated_at = now()
+  FROM (SELECT artist_id, count(*) AS shows FROM rolled GROUP BY artist_id) AS rolled_artist
+  WHERE artist.id = rolled_artist.artist_id
+  RETURNING artist.id
+)
+SELECT (SELECT count(*) FROM rolled), (SELECT count(*) FROM venues_rolled), (SELECT count(*) FROM artists_rolled)
+'''
+
+# Recounts the show counters of every {table} from the show table and
+# returns the ids whose counters were wrong.
+RECOUNT_SHOWS_SQL = '''
+UPDATE {table} SET upcoming_shows_count = counted.upcoming, past_shows_count = counted.past, updated_at = now()
+FROM (
+  SELECT {table}.id,
+    count(show.id) FILTER (WHERE show.is_upcoming) AS upcoming,
+    count(show.id) FILTER (WHERE NOT show.is_upcoming) AS past
+  FROM {table} LEFT JOIN show ON show.{table}_id = {table}.id
+  GROUP BY {table}.id
+) AS counted
+WHERE {table}.id = counted.id
+  AND ({table}.upcoming_shows_count, {table}.past_shows_count) IS DISTINCT FROM (counted.upcoming, counted.past)
+RETURNING {table}.id
+'''
+
+def refresh_show_counters():
+  # Recounts every show counter; returns the venue and artist ids that were off.
+  venue_ids = [row[0] for row in db.session.execute(RECOUNT_SHOWS_SQL.format(table='venue'))]
+  artist_ids = [row[0] for row in db.session.execute(RECOUNT_SHOWS_SQL.format(table='artist'))]
+  return venue_ids, artist_ids
+
+def invalidate_from_command(*namespaces):
+  # A command runs in a process of its own: its invalidations only reach the
+  # web workers through a shared cache. With a per-process one, they keep
+  # serving their cached data until it expires.
+  view_cache.invalidate(*namespaces)
+  if view_cache.per_process:
+    click.echo(f'warning: the {app.config["CACHE_TYPE"]} view cache is per process, the web workers may serve '
+               f'stale pages for {app.config["CACHE_DEFAULT_TTL"]} s; use CACHE_TYPE=redis', err=True)
+
+@app.cli.command('roll-shows')
+def roll_shows():
+  # Meant to run periodically, e.g. every minute from cron.
+  shows, venues, artists = db.session.execute(ROLL_SHOWS_SQL).first()
+  db.session.commit()
+  if shows:
+    invalidate_from_command('venues', 'artists', 'venue-pages', 'artist-pages')
+  click.echo(f'{shows} shows rolled to past ({venues} venues, {artists} artists)')
+
+@app.cli.command('check-show-counters')
+@click.option('--fix', is_flag=True, help='Correct the counters and flags that are off.')
+def check_show_counters(fix):
+  # Verifies the show flags and the venue/artist counters against the show table.
+  misflagged = db.session.execute(
+    'SELECT count(*) FROM show WHERE is_upcoming IS DISTINCT FROM (start_time > now())').scalar()
+  if fix:
+    db.session.execute('UPDATE show SET is_upcoming = start_time > now() WHERE is_upcoming IS DISTINCT FROM (start_time > now())')
+  venue_ids, artist_ids = refresh_show_counters()
+
+  if fix:
+    db.session.commit()
+    invalidate_from_command('venues', 'artists', 'venue-pages', 'artist-pages')
+  else:
+    db.session.rollback()
+  click.echo(f'{misflagged} shows with a stale upcoming flag (rolled by roll-shows)')
+  click.echo(f'{len(venue_ids)} venues with wrong counters: {venue_ids[:20]}')
+  click.echo(f'{len(artist_ids)} artists with wrong counters: {artist_ids[:20]}')
+  if (venue_ids or artist_ids) and not fix:
+    raise click.ClickException('show counters are inconsistent, run with --fix to correct them')
+
+# Tables the import and export commands work on, with the form that validates
+# imported rows and the function turning a validated form into a row.
+BULK_TABLES = {
+  'venues': (Venue, VenueForm, venue_record),
+  'artists': (Artist, ArtistForm, artist_record),
+  'shows': (Show, ShowForm, show_record),
+}
+
+@app.cli.command('import')
+@click.argument('table', type=click.Choice(list(BULK_TABLES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows inserted per transaction.')
+def import_data(table, path, fmt, batch_size):
+  # Streams a CSV or JSON Lines file into a table. Rows are validated with the
+  # same form as the create pages and inserted with one executemany per batch;
+  # rejected rows go to <path>.rejected.jsonl.
+  model, form_class, to_record = BULK_TABLES[table]
+  quarantine_path = path + '.rejected.jsonl'
+
+  def progress(loaded, rejected, elapsed):
+    click.echo(f'{table}: {loaded} loaded, {rejected} rejected, {loaded / max(elapsed, 1e-9):.0f} rows/s')
+
+  importer = Importer(db.session, model.__table__, form_class, to_record, quarantine_path,
+    batch_size=batch_size, progress=progress)
+  loaded, rejected = importer.run(read_rows(path, file_format(path, fmt)))
+  # Bulk inserts bypass the ORM events that maintain the show counters and
+  # invalidate the view cache
+  if table == 'shows' and loaded:
+    refresh_show_counters()
+    db.session.commit()
+  invalidate_from_command('venues', 'artists', 'shows', 'venue-pages', 'artist-pages')
+
+  click.echo(f'{table}: done, {loaded} loaded, {rejected} rejected')
+  if rejected:
+    click.echo(f'rejected rows written to {quarantine_path}')
+
+@app.cli.command('export')
+@click.argument('table', type=click.Choice(list(BULK_TABLES)))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='csv', show_default=True)
+@click.option('--output', '-o', default='-', help='File to write, - for stdout. Parquet needs a file.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows fetched per round trip.')
+def export_data(table, fmt, output, batch_size):
+  # Streams a whole table out of a server-side cursor in constant memory.
+  model = BULK_TABLES[table][0]
+  batches = export_batches(db.session, model.__table__, batch_size)
+  if fmt == 'parquet':
+    if output == '-':
+      raise click.UsageError('parquet output needs --output')
+    export_parquet(model.__table__, batches, output)
+    return
+  chunks = export_csv(model.__table__, batches) if fmt == 'csv' else export_jsonl(batches, dumps)
+  with click.open_file(output, 'wb') as target:
+    for chunk in chunks:
+      target.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
@@ -0,0 +1,381 @@
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#----------------------------------------------------------------------------#
+
+# Serves the app from an event loop, e.g. with
+#
+#   uvicorn asgi:application --workers 4
+#
+# The read views (listings, searches and detail pages, HTML and JSON) run as
+# coroutines over SQLAlchemy's asyncio extension and asyncpg, so a worker
+# keeps serving other requests while their queries are in flight, and the
+# independent queries of one view run concurrently on separate connections.
+# Every other route runs the regular Flask view in a thread pool.
+#
+# Needs the packages in requirements-asgi.txt: asgiref, asyncpg and an ASGI
+# server such as uvicorn.
+# Like wsgi.py, it runs with the production configuration by default.
+
+import asyncio
+import io
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import abort, make_response, render_template, request
+from sqlalchemy import select, tuple_
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from werkzeug.exceptions import HTTPException
+
+# The production configuration and compiled templates, as under WSGI
+import wsgi
+
+from api import api_response
+from app import (app, Venue, Artist, Show, artist_details, detail_show_lists, has_genre, page_limit,
+                 page_surrogate_keys, parse_show_cursor, past_shows_statement, search_args, search_count_statement,
+                 search_results, search_statement, show_cursor, upcoming_shows_statement, venue_areas, venue_details)
+from cache import view_cache
+from http_cache import add_cache_headers, not_modified_response
+from routing import current_replica
+
+
+#  Database
+#  ----------------------------------------------------------------
+
+def async_engine_options(config):
+  # The async counterpart of pooling.engine_options().
+  options = {
+    'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    'pool_recycle': config['DB_POOL_RECYCLE'],
+  }
+  statement_timeout = config['DB_STATEMENT_TIMEOUT_MS']
+
+  if config['DB_PGBOUNCER']:
+    # PgBouncer in transaction mode can't keep asyncpg's prepared statements
+    options['poolclass'] = NullPool
+    options['connect_args'] = {'statement_cache_size': 0}
+    options['execution_options'] = {'statement_timeout_ms': statement_timeout}
+  else:
+    options.update({
+      'pool_size': config['DB_POOL_SIZE'],
+      'max_overflow': config['DB_MAX_OVERFLOW'],
+      'pool_timeout': config['DB_POOL_TIMEOUT'],
+    })
+    if statement_timeout:
+      options['connect_args'] = {'server_settings': {'statement_timeout': str(statement_timeout)}}
+
+  return options
+
+
+class AsyncDatabase(object):
+  # One asyncpg engine per database (the primary and each replica bind),
+  # created on first use: an engine's connections belong to the event loop
+  # that opened them.
+
+  def __init__(self, app):
+    self.app = app
+    self.engines = {}
+
+  def engine(self):
+    bind = current_replica(self.app)
+    engine = self.engines.get(bind)
+    if engine is None:
+      uri = self.app.config['SQLALCHEMY_BINDS'][bind] if bind else self.app.config['SQLALCHEMY_DATABASE_URI']
+      url = make_url(uri).set(drivername='postgresql+asyncpg')
+      if self.app.config['DB_PGBOUNCER']:
+        url = url.update_query_dict({'prepared_statement_cache_size': '0'})
+      engine = self.engines[bind] = create_async_engine(url, **async_engine_options(self.app.config))
+    return engine
+
+  async def all(self, statement):
+    async with self.engine().connect() as connection:
+      return (await connection.execute(statement)).all()
+
+  async def first(self, statement):
+    async with self.engine().connect() as connection:
+      return (await connection.execute(statement)).first()
+
+  async def scalar(self, statement):
+    async with self.engine().connect() as connection:
+      return await connection.scalar(statement)
+
+  async def dispose(self):
+    for engine in self.engines.values():
+      await engine.dispose()
+    self.engines.clear()
+
+
+database = AsyncDatabase(app)
+
+
+#  Data
+#  ----------------------------------------------------------------
+#  The same data as the page functions of app.py, shaped by the same
+#  helpers, with independent queries gathered.
+
+async def keyset_page(statement, limit):
+  rows = await database.all(statement.limit(limit + 1))
+  return rows[:limit], len(rows) > limit
+
+async def venues_page(after, limit, genre):
+  statement = select(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count.label('num_upcoming_shows')) \
+    .order_by(Venue.id)
+  if after is not None:
+    statement = statement.where(Venue.id > after)
+  if genre:
+    statement = statement.where(has_genre(Venue, genre))
+  venue_rows, has_next = await keyset_page(statement, limit)
+  return {'areas': venue_areas(venue_rows), 'next_after': venue_rows[-1].id if has_next else None}
+
+async def artists_page(after, limit, genre):
+  statement = select(Artist.id, Artist.name).order_by(Artist.id)
+  if after is not None:
+    statement = statement.where(Artist.id > after)
+  if genre:
+    statement = statement.where(has_genre(Artist, genre))
+  artist_rows, has_next = await keyset_page(statement, limit)
+  return {
+    'artists': [{'id': artist.id, 'name': artist.name} for artist in artist_rows],
+    'next_after': artist_rows[-1].id if has_next else None
+  }
+
+async def shows_page(after, limit):
+  statement = select(
+    Show.id,
+    Show.start_time,
+    Show.venue_id,
+    Venue.name.label('venue_name'),
+    Show.artist_id,
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link')
+  ).join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id).order_by(Show.start_time, Show.id)
+  if after is not None:
+    statement = statement.where(tuple_(Show.start_time, Show.id) > after)
+  show_rows, has_next = await keyset_page(statement, limit)
+  return {
+    'shows': [dict(show._mapping) for show in show_rows],
+    'next_after': show_cursor(show_rows[-1]) if has_next else None
+  }
+
+async def search_page(model, search_term, after):
+  # The page and the count are fetched concurrently.
+  rows, count = await asyncio.gather(
+    database.all(search_statement(model, search_term, after)),
+    database.scalar(search_count_statement(model, search_term)))
+  return search_results(rows, count)
+
+async def venue_page(venue_id, past_before):
+  # The venue row, its upcoming shows and its page of past shows are fetched concurrently.
+  before = parse_show_cursor(past_before) if past_before is not None else None
+  venue, upcoming, past = await asyncio.gather(
+    database.first(select(Venue.__table__).where(Venue.id == venue_id)),
+    database.all(upcoming_shows_statement(Show.venue_id == venue_id)),
+    database.all(past_shows_statement(Show.venue_id == venue_id, before)))
+  if venue is None:
+    abort(404)
+  return venue_details(venue, *detail_show_lists(past, upcoming))
+
+async def artist_page(artist_id, past_before):
+  before = parse_show_cursor(past_before) if past_before is not None else None
+  artist, upcoming, past = await asyncio.gather(
+    database.first(select(Artist.__table__).where(Artist.id == artist_id)),
+    database.all(upcoming_shows_statement(Show.artist_id == artist_id)),
+    database.all(past_shows_statement(Show.artist_id == artist_id, before)))
+  if artist is None:
+    abort(404)
+  return artist_details(artist, *detail_show_lists(past, upcoming))
+
+
+#  Views
+#  ----------------------------------------------------------------
+#  Coroutine versions of the app.py views, by endpoint.
+
+def listing_args():
+  return page_limit(), request.args.get('after', type=int), request.args.get('genre')
+
+def show_listing_args():
+  limit = page_limit()
+  after = request.args.get('after')
+  return limit, after, parse_show_cursor(after) if after is not None else None
+
+async def cached_venues_page():
+  limit, after, genre = listing_args()
+  page = await view_cache.cached_async(('venues',), f'venues:{after}:{limit}:{genre}', lambda: venues_page(after, limit, genre))
+  return limit, genre, page
+
+async def cached_artists_page():
+  limit, after, genre = listing_args()
+  page = await view_cache.cached_async(('artists',), f'artists:{after}:{limit}:{genre}', lambda: artists_page(after, limit, genre))
+  return limit, genre, page
+
+async def cached_shows_page():
+  limit, after, after_cursor = show_listing_args()
+  page = await view_cache.cached_async(('shows',), f'shows:{after}:{limit}', lambda: shows_page(after_cursor, limit))
+  return limit, page
+
+async def cached_venue_page(venue_id, past_before):
+  return await view_cache.cached_async((f'venue:{venue_id}', 'venue-pages'), f'venue:{venue_id}:{past_before}',
+                                       lambda: venue_page(venue_id, past_before))
+
+async def cached_artist_page(artist_id, past_before):
+  return await view_cache.cached_async((f'artist:{artist_id}', 'artist-pages'), f'artist:{artist_id}:{past_before}',
+                                       lambda: artist_page(artist_id, past_before))
+
+async def venues():
+  limit, genre, page = await cached_venues_page()
+  return render_template('pages/venues.html', limit=limit, genre=genre, page=page)
+
+async def search_venues():
+  search_term, after = search_args(request.values)
+  return render_template('pages/search_venues.html', search_term=search_term, **await search_page(Venue, search_term, after))
+
+async def entity_version(model, entity_id):
+  updated_at = await database.scalar(select(model.updated_at).where(model.id == entity_id))
+  if updated_at is None:
+    abort(404)
+  return updated_at
+
+async def show_venue(venue_id):
+  key = f'venue-{venue_id}'
+  response = not_modified_response(key, await entity_version(Venue, venue_id))
+  if response is not None:
+    return response
+  past_before = request.args.get('past_before')
+  data = await cached_venue_page(venue_id, past_before)
+  response = make_response(render_template('pages/show_venue.html', venue=data, past_before=past_before))
+  return add_cache_headers(response, key, data['updated_at'], page_surrogate_keys(key, data, 'artist'))
+
+async def artists():
+  limit, genre, page = await cached_artists_page()
+  return render_template('pages/artists.html', limit=limit, genre=genre, page=page)
+
+async def search_artists():
+  search_term, after = search_args(request.values)
+  return render_template('pages/search_artists.html', search_term=search_term, **await search_page(Artist, search_term, after))
+
+async def show_artist(artist_id):
+  key = f'artist-{artist_id}'
+  response = not_modified_response(key, await entity_version(Artist, artist_id))
+  if response is not None:
+    return response
+  past_before = request.args.get('past_before')
+  data = await cached_artist_page(artist_id, past_before)
+  response = make_response(render_template('pages/show_artist.html', artist=data, past_before=past_before))
+  return add_cache_headers(response, key, data['updated_at'], page_surrogate_keys(key, data, 'venue'))
+
+async def shows():
+  limit, page = await cached_shows_page()
+  return render_template('pages/shows.html', limit=limit, page=page)
+
+async def api_venues():
+  return api_response((await cached_venues_page())[2])
+
+async def api_search_venues():
+  return api_response(await search_page(Venue, *search_args(request.args)))
+
+async def api_show_venue(venue_id):
+  return api_response(await cached_venue_page(venue_id, request.args.get('past_before')))
+
+async def api_artists():
+  return api_response((await cached_artists_page())[2])
+
+async def api_search_artists():
+  return api_response(await search_page(Artist, *search_args(request.args)))
+
+async def api_show_artist(artist_id):
+  return api_response(await cached_artist_page(artist_id, request.args.get('past_before')))
+
+async def api_shows():
+  return api_response((await cached_shows_page())[1])
+
+ASYNC_VIEWS = {view.__name__: view for view in (
+  venues, search_venues, show_venue, artists, search_artists, show_artist, shows,
+  api_venues, api_search_venues, api_show_venue, api_artists, api_search_artists, api_show_artist, api_shows,
+)}
+
+
+#  Application
+#  ----------------------------------------------------------------
+
+class Application(object):
+  # ASGI application: requests for an endpoint in ASYNC_VIEWS run its
+  # coroutine inside a regular Flask request context, with the app's
+  # before/after request hooks, error handlers and session; anything else
+  # goes to the WSGI app.
+
+  def __init__(self, app, async_views):
+    self.app = app
+    self.async_views = async_views
+    self.wsgi_application = WsgiToAsgi(app)
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      await self.lifespan(receive, send)
+    elif scope['type'] == 'http' and self.async_endpoint(scope) is not None:
+      await self.dispatch(scope, receive, send)
+    else:
+      # asgiref runs every WSGI request in one shared thread by default; a
+      # context per request gives each its own thread, so that they don't
+      # queue behind each other.
+      async with ThreadSensitiveContext():
+        await self.wsgi_application(scope, receive, send)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await database.dispose()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  def async_endpoint(self, scope):
+    root_path = scope.get('root_path', '')
+    adapter = self.app.url_map.bind('localhost', script_name=root_path or None)
+    try:
+      endpoint, _ = adapter.match(scope['path'][len(root_path):], method=scope['method'])
+    except HTTPException:
+      return None
+    return endpoint if endpoint in self.async_views else None
+
+  async def dispatch(self, scope, receive, send):
+    body = io.BytesIO()
+    while True:
+      message = await receive()
+      body.write(message.get('body', b''))
+      if not message.get('more_body'):
+        break
+    body.seek(0)
+    # WsgiToAsgiInstance.build_environ is not documented API: asgiref is
+    # pinned in requirements-asgi.txt
+    wsgi_instance = WsgiToAsgiInstance(self.app)
+    wsgi_instance.scope = scope
+    environ = wsgi_instance.build_environ(scope, body)
+
+    # The same steps as Flask.wsgi_app() and Flask.full_dispatch_request()
+    ctx = self.app.request_context(environ)
+    error = None
+    try:
+      try:
+        ctx.push()
+        try:
+          rv = self.app.preprocess_request()
+          if rv is None:
+            rv = await self.async_views[request.endpoint](**request.view_args)
+        except Exception as e:
+          rv = self.app.handle_user_exception(e)
+        response = self.app.finalize_request(rv)
+      except Exception as e:
+        error = e
+        response = self.app.handle_exception(e)
+      await send({'type': 'http.response.start', 'status': response.status_code,
+                  'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                              for name, value in response.headers.to_wsgi_list()]})
+      await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else response.get_data()})
+    finally:
+      ctx.pop(error)
+
+
+application = Application(app, ASYNC_VIEWS)
@@ -0,0 +1,146 @@
+"""Cold start benchmark.
+
+Measures, in fresh interpreters, how long it takes to import the app
+(app.py alone, and wsgi.py, which also compiles every template), and how
+long the first and the second request to a few pages take after each.
+Then lists the modules that take longest to import with app.py, from
+python -X importtime: the project's own modules (forms.py among them) with
+their dependencies, and the heaviest modules overall by their own time.
+Then measures how long gunicorn, configured by gunicorn.conf.py, takes from
+launch to answering its first request, with and without preload_app.
+
+    DATABASE_URL=postgresql://localhost:5432/fyyur SECRET_KEY=... \
+        python benchmarks/cold_start.py
+
+The database is only read.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PAGES = ('/', '/venues', '/venues/create', '/shows/create', '/shows')
+
+# Runs in a fresh interpreter: imports module, then requests every page twice
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter() - started
+client = module.app.test_client()
+requests = {}
+for path in sys.argv[2:]:
+  timings = []
+  for _ in range(2):
+    started = time.perf_counter()
+    client.get(path)
+    timings.append(time.perf_counter() - started)
+  requests[path] = timings
+print(json.dumps({'import': imported, 'requests': requests}))
+'''
+
+
+def probe(module, env):
+  output = subprocess.run([sys.executable, '-c', PROBE, module, *PAGES], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True).stdout
+  return json.loads(output.strip().splitlines()[-1])
+
+
+def import_times(env):
+  # {module: (self, cumulative)} microseconds spent importing app.py, as
+  # reported on stderr by python -X importtime.
+  stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True).stderr
+  times = {}
+  for line in stderr.splitlines():
+    if not line.startswith('import time:') or 'self [us]' in line:
+      continue
+    own, cumulative, module = line[len('import time:'):].split('|')
+    times[module.strip()] = (int(own), int(cumulative))
+  return times
+
+
+def project_modules():
+  return {name[:-len('.py')] for name in os.listdir(ROOT) if name.endswith('.py')}
+
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(('127.0.0.1', 0))
+    return sock.getsockname()[1]
+
+
+def gunicorn_boot(env, preload):
+  # Seconds from launching gunicorn to its first successful response.
+  port = free_port()
+  env = dict(env, GUNICORN_PRELOAD='true' if preload else 'false')
+  started = time.perf_counter()
+  server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+  try:
+    while time.perf_counter() - started < 60:
+      if server.poll() is not None:
+        sys.exit(f'gunicorn exited with status {server.returncode}')
+      try:
+        urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1).read()
+        return time.perf_counter() - started
+      except OSError:
+        time.sleep(0.02)
+    sys.exit('gunicorn did not answer within 60 s')
+  finally:
+    server.terminate()
+    server.wait()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per measurement')
+  parser.add_argument('--imports', type=int, default=10, help='heaviest modules listed by their own import time')
+  parser.add_argument('--skip-gunicorn', action='store_true')
+  args = parser.parse_args()
+
+  env = dict(os.environ, SQL_INSTRUMENTATION='false', FYYUR_ENV='production')
+  if 'SECRET_KEY' not in env:
+    parser.error('SECRET_KEY must be set, wsgi.py runs with the production configuration')
+
+  print(f'median of {args.repeat} fresh interpreters, in ms')
+  print(f'{"module":<8} {"import":>8}  ' + '  '.join(f'{page + " 1st/2nd":>22}' for page in PAGES))
+  for module in ('app', 'wsgi'):
+    runs = [probe(module, env) for _ in range(args.repeat)]
+    imported = statistics.median(run['import'] for run in runs) * 1000
+    cells = []
+    for page in PAGES:
+      first = statistics.median(run['requests'][page][0] for run in runs) * 1000
+      second = statistics.median(run['requests'][page][1] for run in runs) * 1000
+      cells.append(f'{first:>13.1f} /{second:>7.1f}')
+    print(f'{module:<8} {imported:>8.1f}  ' + '  '.join(cells))
+
+  runs = [import_times(env) for _ in range(args.repeat)]
+  modules = set.intersection(*(set(run) for run in runs))
+  median = {module: tuple(statistics.median(run[module][i] for run in runs) / 1000 for i in (0, 1))
+            for module in modules}
+  print()
+  print('importing app.py, in ms: the project\'s modules with their dependencies')
+  own_modules = sorted(modules & project_modules(), key=lambda module: -median[module][1])
+  for module in own_modules:
+    print(f'{module:<40} {median[module][1]:>8.1f}')
+  print(f'heaviest {args.imports} modules by their own import time')
+  for module in sorted(modules, key=lambda module: -median[module][0])[:args.imports]:
+    print(f'{module:<40} {median[module][0]:>8.1f}')
+
+  if not args.skip_gunicorn:
+    print()
+    for preload in (True, False):
+      boot = statistics.median(gunicorn_boot(env, preload) for _ in range(args.repeat)) * 1000
+      print(f'gunicorn {"with" if preload else "without"} preload_app: first response after {boot:.0f} ms')
+
+
+if __name__ == '__main__':
+  main()
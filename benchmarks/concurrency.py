@@ -0,0 +1,175 @@
+"""Throughput of the sync (WSGI) and async (ASGI) serving modes under many
+concurrent connections.
+
+Fills a scratch database with benchmarks/synthetic.py, then starts each
+server in turn and keeps --connections keep-alive connections busy for
+--duration seconds. Each connection requests venue, artist, search and
+show pages picked at random, and the benchmark reports requests/s, the
+p50 and p99 latency and the failed requests of each mode.
+
+    BENCHMARK_DATABASE_URL=postgresql://localhost:5432/fyyur_bench \
+        python benchmarks/concurrency.py --shows 100000 --connections 1000
+
+The servers are started with --sync-command and --async-command, where
+{bind} stands for the address to listen on. Both default to 4 worker
+processes and need gunicorn, uvicorn and the packages asgi.py needs. The
+view cache is off unless --cache is given, so that every request reaches
+the database. Raise the open file limit (ulimit -n) above --connections.
+
+The tables in BENCHMARK_DATABASE_URL are dropped and recreated: never
+point it at a database whose data you want to keep.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import app, db, Venue, Artist
+from synthetic import generate
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SYNC_COMMAND = 'gunicorn --workers 4 --worker-class gthread --threads 16 --bind {bind} app:app'
+ASYNC_COMMAND = 'uvicorn asgi:application --workers 4 --no-access-log --host {host} --port {port}'
+
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(('127.0.0.1', 0))
+    return sock.getsockname()[1]
+
+
+def start_server(command, port, env):
+  command = command.format(bind=f'127.0.0.1:{port}', host='127.0.0.1', port=port)
+  server = subprocess.Popen(command.split(), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+  deadline = time.monotonic() + 30
+  while time.monotonic() < deadline:
+    if server.poll() is not None:
+      sys.exit(f'{command} exited with status {server.returncode}')
+    try:
+      socket.create_connection(('127.0.0.1', port), timeout=1).close()
+      return server
+    except OSError:
+      time.sleep(0.2)
+  server.terminate()
+  sys.exit(f'{command} did not start listening')
+
+
+async def read_response(reader):
+  # Status and body length of one HTTP/1.1 response with a Content-Length.
+  status_line = await reader.readline()
+  if not status_line:
+    raise ConnectionError('connection closed')
+  length = 0
+  while True:
+    line = await reader.readline()
+    if line in (b'\r\n', b''):
+      break
+    name, _, value = line.decode('latin-1').partition(':')
+    if name.lower() == 'content-length':
+      length = int(value)
+  await reader.readexactly(length)
+  return int(status_line.split()[1])
+
+
+async def connection_loop(port, paths, deadline, latencies, failures, rng):
+  reader = writer = None
+  while time.monotonic() < deadline:
+    path = rng.choice(paths)
+    started = time.perf_counter()
+    try:
+      if writer is None:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+      writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n\r\n'.encode())
+      status = await read_response(reader)
+      if status >= 500:
+        failures.append(status)
+      else:
+        latencies.append(time.perf_counter() - started)
+    except (OSError, asyncio.IncompleteReadError, ConnectionError, ValueError, IndexError):
+      failures.append(None)
+      if writer is not None:
+        writer.close()
+      reader = writer = None
+  if writer is not None:
+    writer.close()
+
+
+async def load(port, paths, connections, duration, seed):
+  latencies = []
+  failures = []
+  deadline = time.monotonic() + duration
+  started = time.perf_counter()
+  await asyncio.gather(*(connection_loop(port, paths, deadline, latencies, failures, random.Random(seed + index))
+                         for index in range(connections)))
+  return latencies, failures, time.perf_counter() - started
+
+
+def request_paths(count, seed):
+  rng = random.Random(seed)
+  venue_ids = [venue_id for venue_id, in db.session.query(Venue.id)]
+  artist_ids = [artist_id for artist_id, in db.session.query(Artist.id)]
+  paths = []
+  for _ in range(count):
+    paths.append(rng.choice((
+      f'/venues/{rng.choice(venue_ids)}',
+      f'/artists/{rng.choice(artist_ids)}',
+      f'/api/v1/venues/{rng.choice(venue_ids)}',
+      f'/venues/search?search_term={rng.randint(1, 99)}',
+      f'/artists/search?search_term={rng.randint(1, 99)}',
+      '/shows',
+      '/venues',
+    )))
+  return paths
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--shows', type=int, default=100000, help='size of the synthetic data set')
+  parser.add_argument('--reuse-data', action='store_true', help='keep the data already in the database')
+  parser.add_argument('--connections', type=int, default=1000)
+  parser.add_argument('--duration', type=float, default=20, help='seconds of load per mode')
+  parser.add_argument('--cache', action='store_true', help='keep the view cache on')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--sync-command', default=SYNC_COMMAND)
+  parser.add_argument('--async-command', default=ASYNC_COMMAND)
+  args = parser.parse_args()
+
+  url = os.environ.get('BENCHMARK_DATABASE_URL')
+  if not url:
+    parser.error('BENCHMARK_DATABASE_URL must point at a scratch database')
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+
+  with app.app_context():
+    if not args.reuse_data:
+      generate(args.shows, seed=args.seed)
+    paths = request_paths(10000, args.seed)
+    db.session.remove()
+
+  env = dict(os.environ, DATABASE_URL=url, SQL_INSTRUMENTATION='false', CACHE_TYPE='lru' if args.cache else 'null')
+  print(f'{args.connections} connections, {args.duration:.0f} s per mode')
+  print(f'{"mode":<6} {"req/s":>9} {"p50 ms":>9} {"p99 ms":>9} {"failed":>8}')
+  for mode, command in (('sync', args.sync_command), ('async', args.async_command)):
+    port = free_port()
+    server = start_server(command, port, env)
+    try:
+      latencies, failures, elapsed = asyncio.run(load(port, paths, args.connections, args.duration, args.seed))
+    finally:
+      server.terminate()
+      server.wait()
+    if len(latencies) < 2:
+      print(f'{mode:<6} {"-":>9} {"-":>9} {"-":>9} {len(failures):>8}')
+      continue
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    print(f'{mode:<6} {len(latencies) / elapsed:>9.1f} {cuts[49] * 1000:>9.1f} {cuts[98] * 1000:>9.1f} {len(failures):>8}')
+
+
+if __name__ == '__main__':
+  main()
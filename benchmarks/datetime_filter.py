@@ -0,0 +1,61 @@
+"""Micro-benchmark for the Jinja datetime filter.
+
+Compares the per-call cost of the original filter, which stringified the
+datetime, re-parsed it with dateutil and formatted it with
+babel.dates.format_datetime, against app.format_datetime on:
+
+  * distinct timestamps (every call formats a new value), and
+  * repeated timestamps (the memoized path, as on a page listing many shows).
+
+    python benchmarks/datetime_filter.py
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime
+
+
+def original_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--calls', type=int, default=20000)
+  args = parser.parse_args()
+
+  start = datetime.datetime(2026, 1, 1, 19, 30)
+  distinct = [start + datetime.timedelta(minutes=17 * i) for i in range(args.calls)]
+  repeated = [distinct[i % 50] for i in range(args.calls)]
+
+  for value in distinct[:1000]:
+    for format in ('full', 'medium'):
+      assert format_datetime(value, format) == original_format_datetime(str(value), format), value
+
+  def run(function, values):
+    format_datetime.cache_clear()
+    seconds = timeit.timeit(lambda: [function(value, 'full') for value in values], number=1)
+    return seconds / len(values) * 1e6
+
+  original = lambda value, format: original_format_datetime(str(value), format)
+  print(f'{"implementation":<12} {"timestamps":<10} {"us/call":>8}')
+  for label, values in (('distinct', distinct), ('repeated', repeated)):
+    print(f'{"original":<12} {label:<10} {run(original, values):>8.2f}')
+    print(f'{"current":<12} {label:<10} {run(format_datetime, values):>8.2f}')
+
+
+if __name__ == '__main__':
+  main()
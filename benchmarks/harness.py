@@ -0,0 +1,353 @@
+"""Benchmark harness for every route of the app.
+
+Fills a scratch database with benchmarks/synthetic.py, then requests every
+route --repeat times, through the Flask test client (--mode client) or
+through a real threaded WSGI server with --concurrency parallel clients
+(--mode server). For each route it reports the p50, p95 and p99 latency,
+the throughput and the number of SQL statements per request, as counted
+by the app's query instrumentation once each response, streamed body
+included, has been sent.
+
+    BENCHMARK_DATABASE_URL=postgresql://localhost:5432/fyyur_bench \
+        python benchmarks/harness.py --shows 100000 --save-baseline benchmarks/baseline.json
+    BENCHMARK_DATABASE_URL=postgresql://localhost:5432/fyyur_bench \
+        python benchmarks/harness.py --shows 100000 --baseline benchmarks/baseline.json
+
+With --baseline, the run is compared to a saved one and the script exits
+with status 1, listing every regression, when a route issues more SQL
+statements than before, or its p95 latency or throughput got worse by
+more than --tolerance. Latencies are only comparable on the same machine
+and data size: save the baseline where the comparison runs.
+
+The tables in BENCHMARK_DATABASE_URL are dropped and recreated: never
+point it at a database whose data you want to keep.
+"""
+import argparse
+import concurrent.futures
+import http.client
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from werkzeug.serving import make_server
+
+# The EXPLAIN of slow statements would skew the timings
+os.environ.setdefault('SQL_SLOW_QUERY_MS', '0')
+
+from app import app, db, query_instrumentation, Venue, Artist, Show
+from synthetic import generate
+
+# How long to wait for the last requests of a scenario to be reported
+QUERY_COUNT_TIMEOUT = 5.0
+
+# Latency changes smaller than this are noise, whatever the tolerance
+MIN_LATENCY_DELTA_MS = 1.0
+
+
+class Fixture(object):
+  # Ids and values the scenarios build their requests from.
+
+  def __init__(self, repeat):
+    # Only the generated rows: earlier runs may have created and deleted others
+    self.venue_ids = [venue_id for venue_id, in db.session.query(Venue.id).filter(Venue.name.like('Venue %'))]
+    self.artist_ids = [artist_id for artist_id, in db.session.query(Artist.id).filter(Artist.name.like('Artist %'))]
+    self.venue_after = max(self.venue_ids) // 2
+    self.artist_after = max(self.artist_ids) // 2
+    middle = db.session.query(Show.start_time, Show.id).order_by(Show.start_time, Show.id) \
+      .offset(db.session.query(Show).count() // 2).first()
+    self.show_after = f'{middle.start_time.isoformat()}_{middle.id}'
+
+    # Venues without shows, for the DELETE scenario to consume
+    db.session.execute(Venue.__table__.insert(), [{
+      'name': f'Disposable venue {index}', 'genres': ['Jazz'], 'address': '1 Main St', 'city': 'City 0', 'state': 'NY',
+      'phone': '555-0100', 'website': '', 'facebook_link': '', 'seeking_talent': False, 'seeking_description': '',
+      'image_link': ''
+    } for index in range(repeat)])
+    db.session.commit()
+    self.disposable_venue_ids = [venue_id for venue_id, in db.session.query(Venue.id)
+                                 .filter(Venue.name.like('Disposable venue %')).order_by(Venue.id)]
+    self._lock = threading.Lock()
+
+  def venue_id(self, rng):
+    return rng.choice(self.venue_ids)
+
+  def artist_id(self, rng):
+    return rng.choice(self.artist_ids)
+
+  def disposable_venue_id(self):
+    with self._lock:
+      return self.disposable_venue_ids.pop()
+
+
+def venue_form(rng):
+  return {
+    'name': f'Benchmark venue {rng.randint(0, 10 ** 6)}', 'city': 'City 0', 'state': 'NY', 'address': '1 Main St',
+    'phone': '555-0100', 'genres': ['Jazz', 'Blues'], 'facebook_link': 'https://www.facebook.com/benchmark',
+    'image_link': 'https://images.example.com/benchmark.jpg', 'website_link': 'https://benchmark.example.com',
+    'seeking_talent': 'y', 'seeking_description': 'Benchmark'
+  }
+
+
+def artist_form(rng):
+  return {
+    'name': f'Benchmark artist {rng.randint(0, 10 ** 6)}', 'city': 'City 0', 'state': 'NY', 'phone': '555-0100',
+    'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/benchmark',
+    'image_link': 'https://images.example.com/benchmark.jpg', 'website_link': 'https://benchmark.example.com',
+    'seeking_venue': 'y', 'seeking_description': 'Benchmark'
+  }
+
+
+def search_term(rng):
+  # Three digits, the shortest term searched
+  return str(rng.randint(100, 999))
+
+
+# (endpoint, scenario, method, build) where build(fixture, rng) returns the
+# path and the form data of one request. Every endpoint of the app must
+# have at least one scenario.
+SCENARIOS = [
+  ('index', 'home', 'GET', lambda f, rng: ('/', None)),
+  ('venues', 'venues', 'GET', lambda f, rng: ('/venues', None)),
+  ('venues', 'venues next page', 'GET', lambda f, rng: (f'/venues?after={f.venue_after}', None)),
+  ('venues', 'venues by genre', 'GET', lambda f, rng: ('/venues?genre=Jazz', None)),
+  ('search_venues', 'search venues', 'POST', lambda f, rng: ('/venues/search', {'search_term': search_term(rng)})),
+  ('search_venues', 'search venues next page', 'GET',
+   lambda f, rng: (f'/venues/search?search_term={search_term(rng)}&after={f.venue_after}', None)),
+  ('show_venue', 'venue', 'GET', lambda f, rng: (f'/venues/{f.venue_id(rng)}', None)),
+  ('create_venue_form', 'new venue form', 'GET', lambda f, rng: ('/venues/create', None)),
+  ('create_venue_submission', 'create venue', 'POST', lambda f, rng: ('/venues/create', venue_form(rng))),
+  ('delete_venue', 'delete venue', 'DELETE', lambda f, rng: (f'/venues/{f.disposable_venue_id()}', None)),
+  ('artists', 'artists', 'GET', lambda f, rng: ('/artists', None)),
+  ('artists', 'artists next page', 'GET', lambda f, rng: (f'/artists?after={f.artist_after}', None)),
+  ('search_artists', 'search artists', 'POST', lambda f, rng: ('/artists/search', {'search_term': search_term(rng)})),
+  ('show_artist', 'artist', 'GET', lambda f, rng: (f'/artists/{f.artist_id(rng)}', None)),
+  ('edit_artist', 'edit artist form', 'GET', lambda f, rng: (f'/artists/{f.artist_id(rng)}/edit', None)),
+  ('edit_artist_submission', 'edit artist', 'POST', lambda f, rng: (f'/artists/{f.artist_id(rng)}/edit', artist_form(rng))),
+  ('edit_venue', 'edit venue form', 'GET', lambda f, rng: (f'/venues/{f.venue_id(rng)}/edit', None)),
+  ('edit_venue_submission', 'edit venue', 'POST', lambda f, rng: (f'/venues/{f.venue_id(rng)}/edit', venue_form(rng))),
+  ('create_artist_form', 'new artist form', 'GET', lambda f, rng: ('/artists/create', None)),
+  ('create_artist_submission', 'create artist', 'POST', lambda f, rng: ('/artists/create', artist_form(rng))),
+  ('shows', 'shows', 'GET', lambda f, rng: ('/shows', None)),
+  ('shows', 'shows next page', 'GET', lambda f, rng: (f'/shows?after={f.show_after}', None)),
+  ('create_shows', 'new show form', 'GET', lambda f, rng: ('/shows/create', None)),
+  ('create_show_submission', 'create show', 'POST', lambda f, rng: ('/shows/create', {
+    'venue_id': str(f.venue_id(rng)), 'artist_id': str(f.artist_id(rng)), 'start_time': '2030-01-01 20:00:00'})),
+  ('api_venues', 'api venues', 'GET', lambda f, rng: ('/api/v1/venues', None)),
+  ('api_search_venues', 'api search venues', 'GET', lambda f, rng: (f'/api/v1/venues/search?search_term={search_term(rng)}', None)),
+  ('api_show_venue', 'api venue', 'GET', lambda f, rng: (f'/api/v1/venues/{f.venue_id(rng)}', None)),
+  ('api_artists', 'api artists', 'GET', lambda f, rng: ('/api/v1/artists', None)),
+  ('api_search_artists', 'api search artists', 'GET', lambda f, rng: (f'/api/v1/artists/search?search_term={search_term(rng)}', None)),
+  ('api_show_artist', 'api artist', 'GET', lambda f, rng: (f'/api/v1/artists/{f.artist_id(rng)}', None)),
+  ('api_shows', 'api shows', 'GET', lambda f, rng: ('/api/v1/shows', None)),
+  ('api_venue_lookup', 'api venue lookup', 'GET', lambda f, rng: (f'/api/v1/venues/lookup?q=venue%20{rng.randint(1, 99)}', None)),
+  ('api_artist_lookup', 'api artist lookup', 'GET', lambda f, rng: (f'/api/v1/artists/lookup?q=artist%20{rng.randint(1, 99)}', None)),
+  ('api_export', 'api export venues', 'GET', lambda f, rng: ('/api/v1/export/venues?format=jsonl', None)),
+  ('pool_stats_view', 'pool stats', 'GET', lambda f, rng: ('/stats/pool', None)),
+  ('cache_stats_view', 'cache stats', 'GET', lambda f, rng: ('/stats/cache', None)),
+  ('metrics_view', 'metrics', 'GET', lambda f, rng: ('/metrics', None)),
+]
+
+
+def check_coverage():
+  endpoints = {rule.endpoint for rule in app.url_map.iter_rules()} - {'static'}
+  missing = endpoints - {endpoint for endpoint, _, _, _ in SCENARIOS}
+  if missing:
+    sys.exit(f'routes without a benchmark scenario: {", ".join(sorted(missing))}')
+
+
+class QueryCounts(object):
+  # SQL statements of each request, from the app's query instrumentation. A
+  # streamed response is reported when closed, which a server may do after
+  # the client has read it, so take() waits for the expected number.
+
+  def __init__(self):
+    self.counts = []
+    self.condition = threading.Condition()
+    query_instrumentation.add_listener(self)
+
+  def record_request(self, queries):
+    with self.condition:
+      self.counts.append(queries.count)
+      self.condition.notify_all()
+
+  def take(self, expected):
+    with self.condition:
+      self.condition.wait_for(lambda: len(self.counts) >= expected, QUERY_COUNT_TIMEOUT)
+      counts, self.counts = self.counts, []
+    return counts
+
+
+class TestClientDriver(object):
+  # Sends requests through the Flask test client, one at a time.
+
+  concurrency = 1
+
+  def __init__(self):
+    self.client = app.test_client()
+
+  def request(self, method, path, data):
+    response = self.client.open(path, method=method, data=data)
+    response.get_data()
+    response.close()
+    return response.status_code
+
+  def close(self):
+    pass
+
+
+class ServerDriver(object):
+  # Sends requests over HTTP to the app served by a threaded WSGI server in
+  # this process, from concurrency client threads.
+
+  def __init__(self, concurrency):
+    self.concurrency = concurrency
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    self.server = make_server('127.0.0.1', 0, app, threaded=True)
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    self.thread.start()
+
+  def request(self, method, path, data):
+    connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=60)
+    try:
+      body = urllib.parse.urlencode(data, doseq=True) if data is not None else None
+      headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body is not None else {}
+      connection.request(method, path, body=body, headers=headers)
+      response = connection.getresponse()
+      response.read()
+      return response.status
+    finally:
+      connection.close()
+
+  def close(self):
+    self.server.shutdown()
+
+
+def run_scenario(driver, query_counts, fixture, scenario, repeat, seed):
+  endpoint, name, method, build = scenario
+  rng = random.Random(seed)
+  requests = [build(fixture, rng) for _ in range(repeat)]
+
+  def send(path_and_data):
+    path, data = path_and_data
+    started = time.perf_counter()
+    status = driver.request(method, path, data)
+    elapsed = time.perf_counter() - started
+    if status >= 500:
+      raise RuntimeError(f'{method} {path} answered {status}')
+    return elapsed
+
+  query_counts.take(0)
+  started = time.perf_counter()
+  with concurrent.futures.ThreadPoolExecutor(driver.concurrency) as executor:
+    timings = [elapsed * 1000 for elapsed in executor.map(send, requests)]
+  wall = time.perf_counter() - started
+  counted = query_counts.take(repeat)
+
+  cuts = statistics.quantiles(timings, n=100, method='inclusive')
+  return {
+    'endpoint': endpoint,
+    'p50_ms': round(cuts[49], 3),
+    'p95_ms': round(cuts[94], 3),
+    'p99_ms': round(cuts[98], 3),
+    'rps': round(repeat / wall, 1),
+    'queries': max(counted) if counted else None,
+  }
+
+
+def compare(results, baseline, tolerance):
+  # Human-readable regressions of results against a baseline run.
+  regressions = []
+  for name, previous in baseline['routes'].items():
+    current = results.get(name)
+    if current is None:
+      regressions.append(f'{name}: no longer measured')
+      continue
+    if previous['queries'] is not None and current['queries'] is not None and current['queries'] > previous['queries']:
+      regressions.append(f'{name}: {current["queries"]} SQL statements per request, was {previous["queries"]}')
+    if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance) and current['p95_ms'] - previous['p95_ms'] > MIN_LATENCY_DELTA_MS:
+      regressions.append(f'{name}: p95 {current["p95_ms"]:.1f} ms, was {previous["p95_ms"]:.1f} ms')
+    if current['rps'] < previous['rps'] / (1 + tolerance):
+      regressions.append(f'{name}: {current["rps"]:.0f} requests/s, was {previous["rps"]:.0f}')
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--shows', type=int, default=100000, help='size of the synthetic data set')
+  parser.add_argument('--skew', type=float, default=1.1)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--reuse-data', action='store_true', help='keep the data already in the database')
+  parser.add_argument('--mode', choices=('client', 'server'), default='client')
+  parser.add_argument('--concurrency', type=int, default=8, help='parallel clients in server mode')
+  parser.add_argument('--repeat', type=int, default=50, help='requests per scenario')
+  parser.add_argument('--only', action='append', help='run only the scenarios with this name')
+  parser.add_argument('--baseline', help='compare against this saved run')
+  parser.add_argument('--tolerance', type=float, default=0.25, help='allowed latency and throughput loss, as a fraction')
+  parser.add_argument('--save-baseline', help='save this run here')
+  args = parser.parse_args()
+
+  url = os.environ.get('BENCHMARK_DATABASE_URL')
+  if not url:
+    parser.error('BENCHMARK_DATABASE_URL must point at a scratch database')
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+  app.config['WTF_CSRF_ENABLED'] = False
+  check_coverage()
+
+  with app.app_context():
+    if not args.reuse_data:
+      generate(args.shows, skew=args.skew, seed=args.seed)
+    fixture = Fixture(args.repeat)
+    db.session.remove()
+
+  driver = ServerDriver(args.concurrency) if args.mode == 'server' else TestClientDriver()
+  query_counts = QueryCounts()
+  results = {}
+  print(f'{"scenario":<24} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>9} {"queries":>8}')
+  try:
+    for index, scenario in enumerate(SCENARIOS):
+      name = scenario[1]
+      if args.only and name not in args.only:
+        continue
+      result = results[name] = run_scenario(driver, query_counts, fixture, scenario, args.repeat, args.seed + index)
+      queries = '-' if result['queries'] is None else result['queries']
+      print(f'{name:<24} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+            f'{result["rps"]:>9.1f} {queries:>8}')
+  finally:
+    driver.close()
+
+  run = {
+    'data': {'shows': args.shows, 'skew': args.skew, 'seed': args.seed},
+    'mode': args.mode, 'concurrency': driver.concurrency, 'repeat': args.repeat,
+    'routes': results,
+  }
+  if args.save_baseline:
+    with open(args.save_baseline, 'w') as target:
+      json.dump(run, target, indent=2, sort_keys=True)
+
+  if args.baseline:
+    with open(args.baseline) as source:
+      baseline = json.load(source)
+    if (baseline['data'], baseline['mode'], baseline['concurrency']) != (run['data'], run['mode'], run['concurrency']):
+      print(f'warning: the baseline ran with {baseline["data"]}, mode {baseline["mode"]}, '
+            f'concurrency {baseline["concurrency"]}', file=sys.stderr)
+    if args.only:
+      baseline['routes'] = {name: route for name, route in baseline['routes'].items() if name in args.only}
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+      print(f'\n{len(regressions)} REGRESSIONS against {args.baseline}:', file=sys.stderr)
+      for regression in regressions:
+        print(f'  {regression}', file=sys.stderr)
+      sys.exit(1)
+    print(f'\nno regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,107 @@
+"""Benchmark for the /shows listing.
+
+Seeds a scratch database with N shows and reports, for the first and the
+last page of /shows, the number of SQL statements issued and the time to
+get the whole streamed page through the Flask test client. The view cache
+is off, so that every request runs the listing query.
+
+    BENCHMARK_DATABASE_URL=postgresql://localhost:5432/fyyur_bench \
+        python benchmarks/shows_listing.py 10000 100000 1000000
+
+The tables in BENCHMARK_DATABASE_URL are dropped and recreated: never
+point it at a database whose data you want to keep.
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import event
+
+# Repeated requests would be served from the view cache
+os.environ['CACHE_TYPE'] = 'null'
+
+from app import app, db, Venue, Artist, Show
+
+BATCH_SIZE = 10000
+
+
+def seed(show_count, venue_count, artist_count):
+  db.drop_all()
+  db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+  db.session.commit()
+  db.create_all()
+
+  db.session.execute(Venue.__table__.insert(), [{
+    'name': f'Venue {i}', 'genres': ['Jazz'], 'address': f'{i} Main St', 'city': f'City {i % 50}',
+    'state': 'NY', 'phone': '555-0100', 'website': 'https://example.com', 'facebook_link': '',
+    'seeking_talent': False, 'seeking_description': '', 'image_link': 'https://example.com/venue.jpg'
+  } for i in range(venue_count)])
+  db.session.execute(Artist.__table__.insert(), [{
+    'name': f'Artist {i}', 'genres': ['Jazz'], 'city': f'City {i % 50}', 'state': 'NY',
+    'image_link': 'https://example.com/artist.jpg'
+  } for i in range(artist_count)])
+
+  start = datetime.datetime.now() - datetime.timedelta(days=365)
+  for offset in range(0, show_count, BATCH_SIZE):
+    db.session.execute(Show.__table__.insert(), [{
+      'venue_id': random.randint(1, venue_count),
+      'artist_id': random.randint(1, artist_count),
+      'start_time': start + datetime.timedelta(minutes=random.randint(0, 2 * 365 * 24 * 60))
+    } for _ in range(min(BATCH_SIZE, show_count - offset))])
+  db.session.commit()
+  db.session.execute('ANALYZE')
+  db.session.commit()
+
+
+def measure(client, url, repeat):
+  statements = []
+  timings = []
+
+  def count_statement(*args):
+    statements[-1] += 1
+
+  event.listen(db.engine, 'before_cursor_execute', count_statement)
+  try:
+    for _ in range(repeat):
+      statements.append(0)
+      started = time.perf_counter()
+      response = client.get(url, buffered=True)
+      timings.append(time.perf_counter() - started)
+      assert response.status_code == 200, (url, response.status_code)
+  finally:
+    event.remove(db.engine, 'before_cursor_execute', count_statement)
+  return max(statements), statistics.median(timings) * 1000
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('sizes', nargs='*', type=int, default=[10000, 100000, 1000000])
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  url = os.environ.get('BENCHMARK_DATABASE_URL')
+  if not url:
+    parser.error('BENCHMARK_DATABASE_URL must point at a scratch database')
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+
+  print(f'{"shows":>10} {"page":>6} {"queries":>8} {"median ms":>10}')
+  with app.app_context():
+    client = app.test_client()
+    for size in args.sizes:
+      seed(size, venue_count=max(size // 100, 1), artist_count=max(size // 50, 1))
+      last = db.session.query(Show.start_time, Show.id).order_by(Show.start_time.desc(), Show.id.desc()) \
+        .offset(app.config['PAGE_SIZE']).first()
+      for page, page_url in (('first', '/shows'), ('last', f'/shows?after={last.start_time.isoformat()}_{last.id}')):
+        queries, median = measure(client, page_url, args.repeat)
+        print(f'{size:>10} {page:>6} {queries:>8} {median:>10.2f}')
+      db.session.remove()
+
+
+if __name__ == '__main__':
+  main()
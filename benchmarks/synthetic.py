@@ -0,0 +1,168 @@
+"""Synthetic data generator.
+
+Fills a scratch database with venues, artists and shows distributed the
+way real listings are: a few big cities hold most venues, a few venues and
+artists play most shows, genres follow a long tail, and shows happen in
+the evening, mostly in the past.
+
+    BENCHMARK_DATABASE_URL=postgresql://localhost:5432/fyyur_bench \
+        python benchmarks/synthetic.py --shows 1000000
+
+By default there is one venue per 100 shows and one artist per 50 shows.
+--skew is the Zipf exponent of the popularity distributions: 0 is uniform,
+and the higher it is, the more the top venues and artists dominate. Rows go
+in with batched core inserts, so 10^7 shows take minutes, not hours.
+
+The tables in BENCHMARK_DATABASE_URL are dropped and recreated: never
+point it at a database whose data you want to keep.
+"""
+import argparse
+import datetime
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import app, db, refresh_show_counters, Venue, Artist, Show
+from forms import GENRE_CHOICES, STATE_CHOICES
+
+BATCH_SIZE = 10000
+
+GENRES = [value for value, _ in GENRE_CHOICES]
+STATES = [value for value, _ in STATE_CHOICES]
+
+# Shows start between PAST_DAYS ago and FUTURE_DAYS from now, in the evening
+PAST_DAYS = 3 * 365
+FUTURE_DAYS = 365
+EVENING_HOURS = (18, 19, 20, 21, 22)
+
+
+def zipf_weights(count, skew, rng):
+  # Cumulative Zipf weights over count items, in random order so that the
+  # most popular items are not simply the lowest ids.
+  weights = [1 / rank ** skew for rank in range(1, count + 1)]
+  rng.shuffle(weights)
+  return list(itertools.accumulate(weights))
+
+
+def batches(rows, size=BATCH_SIZE):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) == size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+
+def insert(table, rows, total, progress):
+  started = time.perf_counter()
+  done = 0
+  for batch in batches(rows):
+    db.session.execute(table.insert(), batch)
+    db.session.commit()
+    done += len(batch)
+    if progress:
+      elapsed = time.perf_counter() - started
+      print(f'\r{table.name}: {done}/{total} ({done / max(elapsed, 1e-9):.0f} rows/s)', end='', file=sys.stderr)
+  if progress:
+    print(file=sys.stderr)
+
+
+def pick_genres(rng, genre_weights):
+  return sorted(set(rng.choices(GENRES, cum_weights=genre_weights, k=rng.choice((1, 1, 2, 2, 3)))))
+
+
+def venue_rows(count, cities, city_weights, genre_weights, rng):
+  for index in range(count):
+    city, state = rng.choices(cities, cum_weights=city_weights)[0]
+    yield {
+      'name': f'Venue {index}', 'genres': pick_genres(rng, genre_weights), 'address': f'{rng.randint(1, 9999)} Main St',
+      'city': city, 'state': state, 'phone': f'555-{rng.randint(0, 9999):04d}',
+      'website': f'https://venue{index}.example.com', 'facebook_link': f'https://www.facebook.com/venue{index}',
+      'seeking_talent': rng.random() < 0.3, 'seeking_description': 'Looking for local bands',
+      'image_link': f'https://images.example.com/venues/{index}.jpg'
+    }
+
+
+def artist_rows(count, cities, city_weights, genre_weights, rng):
+  for index in range(count):
+    city, state = rng.choices(cities, cum_weights=city_weights)[0]
+    yield {
+      'name': f'Artist {index}', 'genres': pick_genres(rng, genre_weights), 'city': city, 'state': state,
+      'phone': f'555-{rng.randint(0, 9999):04d}', 'website': f'https://artist{index}.example.com',
+      'facebook_link': f'https://www.facebook.com/artist{index}', 'seeking_venue': rng.random() < 0.3,
+      'seeking_description': 'Looking for shows', 'image_link': f'https://images.example.com/artists/{index}.jpg'
+    }
+
+
+def show_rows(count, venue_count, venue_weights, artist_count, artist_weights, rng):
+  venue_ids = range(1, venue_count + 1)
+  artist_ids = range(1, artist_count + 1)
+  today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+  now = datetime.datetime.now()
+  for _ in range(count):
+    start_time = today + datetime.timedelta(days=rng.randint(-PAST_DAYS, FUTURE_DAYS),
+                                            hours=rng.choice(EVENING_HOURS), minutes=rng.choice((0, 30)))
+    yield {
+      'venue_id': rng.choices(venue_ids, cum_weights=venue_weights)[0],
+      'artist_id': rng.choices(artist_ids, cum_weights=artist_weights)[0],
+      'start_time': start_time,
+      'is_upcoming': start_time > now
+    }
+
+
+def generate(shows, venues=None, artists=None, skew=1.1, seed=0, progress=True):
+  # Recreates the tables and fills them. Returns (venues, artists, shows).
+  venues = venues or max(shows // 100, 1)
+  artists = artists or max(shows // 50, 1)
+  rng = random.Random(seed)
+
+  db.drop_all()
+  db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+  db.session.commit()
+  db.create_all()
+
+  cities = [(f'City {index}', STATES[index % len(STATES)]) for index in range(max(venues // 25, 10))]
+  city_weights = zipf_weights(len(cities), skew, rng)
+  genre_weights = zipf_weights(len(GENRES), 1, rng)
+
+  insert(Venue.__table__, venue_rows(venues, cities, city_weights, genre_weights, rng), venues, progress)
+  insert(Artist.__table__, artist_rows(artists, cities, city_weights, genre_weights, rng), artists, progress)
+  insert(Show.__table__, show_rows(shows, venues, zipf_weights(venues, skew, rng), artists, zipf_weights(artists, skew, rng), rng),
+         shows, progress)
+
+  # Core inserts bypass the ORM events that maintain the show counters
+  refresh_show_counters()
+  db.session.commit()
+  db.session.execute('ANALYZE')
+  db.session.commit()
+  return venues, artists, shows
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--shows', type=int, default=100000)
+  parser.add_argument('--venues', type=int, help='default: one per 100 shows')
+  parser.add_argument('--artists', type=int, help='default: one per 50 shows')
+  parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of venue, artist and city popularity')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  url = os.environ.get('BENCHMARK_DATABASE_URL')
+  if not url:
+    parser.error('BENCHMARK_DATABASE_URL must point at a scratch database')
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+
+  started = time.perf_counter()
+  with app.app_context():
+    venues, artists, shows = generate(args.shows, args.venues, args.artists, args.skew, args.seed)
+  print(f'{venues} venues, {artists} artists and {shows} shows in {time.perf_counter() - started:.1f} s')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,123 @@
+"""Template compile and render benchmark.
+
+Measures, for every template, how long compiling it from source takes
+against loading it from the bytecode cache in TEMPLATE_CACHE_DIR. Then
+fills a scratch database with benchmarks/synthetic.py and requests the
+pages below --repeat times each, with {% cache %} fragments off and on. It
+reports the median and p95 time spent in render_template per route. The
+detail pages are those of the venues and artists with the most shows.
+
+    BENCHMARK_DATABASE_URL=postgresql://localhost:5432/fyyur_bench \
+        python benchmarks/templates.py --shows 100000
+
+The tables in BENCHMARK_DATABASE_URL are dropped and recreated unless
+--reuse-data is given: never point it at a database whose data you want
+to keep.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache
+
+from app import app, db, Venue, Artist
+from cache import view_cache
+from synthetic import generate
+
+
+def load_all(environment):
+  started = time.perf_counter()
+  for name in environment.list_templates(extensions=['html']):
+    environment.get_template(name)
+  return time.perf_counter() - started
+
+
+def compile_times(repeat):
+  # (from source, from bytecode cache) seconds to load every template, in
+  # environments without an in-memory template cache.
+  with tempfile.TemporaryDirectory() as directory:
+    source = app.jinja_env.overlay(cache_size=0, bytecode_cache=None)
+    bytecode = app.jinja_env.overlay(cache_size=0, bytecode_cache=FileSystemBytecodeCache(directory))
+    load_all(bytecode)
+    return (statistics.median(load_all(source) for _ in range(repeat)),
+            statistics.median(load_all(bytecode) for _ in range(repeat)))
+
+
+def busiest(model, count):
+  return [entity_id for entity_id, in db.session.query(model.id)
+          .order_by((model.upcoming_shows_count + model.past_shows_count).desc()).limit(count)]
+
+
+class RenderTimer(object):
+  # Seconds spent in each render_template call, from Flask's template signals.
+
+  def __init__(self):
+    self.started = []
+    self.timings = []
+    before_render_template.connect(self.start, app)
+    template_rendered.connect(self.finish, app)
+
+  def start(self, sender, template, context, **extra):
+    self.started.append(time.perf_counter())
+
+  def finish(self, sender, template, context, **extra):
+    self.timings.append(time.perf_counter() - self.started.pop())
+
+
+def render_times(client, timer, path, repeat):
+  del timer.timings[:]
+  for _ in range(repeat):
+    response = client.get(path)
+    if response.status_code != 200:
+      sys.exit(f'{path} answered {response.status_code}')
+  return timer.timings
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--shows', type=int, default=100000, help='size of the synthetic data set')
+  parser.add_argument('--reuse-data', action='store_true', help='keep the data already in the database')
+  parser.add_argument('--repeat', type=int, default=50, help='requests per route and mode')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  url = os.environ.get('BENCHMARK_DATABASE_URL')
+  if not url:
+    parser.error('BENCHMARK_DATABASE_URL must point at a scratch database')
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+
+  from_source, from_bytecode = compile_times(args.repeat)
+  print(f'loading every template: {from_source * 1000:.1f} ms from source, {from_bytecode * 1000:.1f} ms from bytecode')
+  print()
+
+  with app.app_context():
+    if not args.reuse_data:
+      generate(args.shows, seed=args.seed)
+    paths = ['/', '/venues', '/artists', '/shows']
+    paths += [f'/venues/{venue_id}' for venue_id in busiest(Venue, 2)]
+    paths += [f'/artists/{artist_id}' for artist_id in busiest(Artist, 2)]
+    db.session.remove()
+
+  timer = RenderTimer()
+  client = app.test_client()
+  print(f'ms in render_template, {args.repeat} requests per route')
+  print(f'{"route":<20} {"off p50":>9} {"off p95":>9} {"on p50":>9} {"on p95":>9}')
+  for path in paths:
+    cells = []
+    for fragment_cache in (None, view_cache):
+      app.jinja_env.fragment_cache = fragment_cache
+      view_cache.invalidate('venues', 'artists', 'shows', 'venue-pages', 'artist-pages')
+      timings = render_times(client, timer, path, args.repeat)
+      cuts = statistics.quantiles(timings, n=20, method='inclusive')
+      cells += [statistics.median(timings) * 1000, cuts[18] * 1000]
+    print(f'{path:<20} ' + ' '.join(f'{cell:>9.2f}' for cell in cells))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,209 @@
+#----------------------------------------------------------------------------#
+# Bulk import and export.
+#----------------------------------------------------------------------------#
+
+import csv
+import datetime
+import inspect
+import io
+import json
+import os
+import time
+
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from werkzeug.datastructures import MultiDict
+from wtforms import BooleanField
+from wtforms.fields.core import UnboundField
+
+# Values of a BooleanField column that read as false in an import file
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n', 'off')
+
+# Form fields named differently from the table column they fill. Import files
+# use the column names, as the export writes them.
+FORM_FIELDS = {'website': 'website_link'}
+
+
+def file_format(path, requested=None):
+  # 'csv' or 'jsonl', from the requested format or the file extension.
+  if requested:
+    return requested
+  return 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+def read_rows(path, fmt):
+  # Streams the rows of a CSV file with a header line, or of a JSON Lines file.
+  with open(path, newline='', encoding='utf-8') as source:
+    if fmt == 'csv':
+      for row in csv.DictReader(source):
+        yield row
+    else:
+      for line in source:
+        if line.strip():
+          yield json.loads(line)
+
+
+def boolean_fields(form_class):
+  return {name for name, field in inspect.getmembers(form_class, lambda member: isinstance(member, UnboundField))
+          if issubclass(field.field_class, BooleanField)}
+
+
+def formdata_for(row, booleans):
+  # Turns an import row into form data. Columns are renamed to their form
+  # field, lists become repeated keys, and a comma-separated string in a CSV
+  # cell stands for a list of genres.
+  formdata = MultiDict()
+  for key, value in row.items():
+    if value is None:
+      continue
+    key = FORM_FIELDS.get(key, key)
+    if key == 'genres' and isinstance(value, str):
+      value = [genre.strip() for genre in value.split(',') if genre.strip()]
+    if key in booleans:
+      value = 'y' if str(value).strip().lower() not in FALSE_VALUES else ''
+    if isinstance(value, list):
+      for item in value:
+        formdata.add(key, str(item))
+    else:
+      formdata.add(key, str(value))
+  return formdata
+
+
+class Importer(object):
+  # Validates rows with a form class and inserts them into table in batches,
+  # one transaction per batch. Rows that fail validation, and every row of a
+  # batch the database rejects, are written to a quarantine JSON Lines file
+  # along with the errors.
+
+  def __init__(self, session, table, form_class, to_record, quarantine_path, batch_size=5000, progress=None):
+    self.session = session
+    self.insert = table.insert()
+    self.form_class = form_class
+    self.to_record = to_record
+    self.quarantine_path = quarantine_path
+    self.batch_size = batch_size
+    self.progress = progress
+    self.booleans = boolean_fields(form_class)
+    self.loaded = 0
+    self.rejected = 0
+    self._quarantine = None
+    self._started = None
+
+  def run(self, rows):
+    self._started = time.perf_counter()
+    if os.path.exists(self.quarantine_path):
+      os.remove(self.quarantine_path)
+    batch = []
+    try:
+      for line, row in enumerate(rows, start=1):
+        form = self.form_class(formdata=formdata_for(row, self.booleans), meta={'csrf': False})
+        if not form.validate():
+          self.quarantine(line, row, form.errors)
+          continue
+        batch.append((line, row, self.to_record(form)))
+        if len(batch) >= self.batch_size:
+          self.flush(batch)
+          batch = []
+      if batch:
+        self.flush(batch)
+    finally:
+      if self._quarantine is not None:
+        self._quarantine.close()
+    return self.loaded, self.rejected
+
+  def flush(self, batch):
+    try:
+      self.session.execute(self.insert, [record for _, _, record in batch])
+      self.session.commit()
+      self.loaded += len(batch)
+    except DBAPIError as error:
+      self.session.rollback()
+      message = str(error.orig).strip()
+      for line, row, _ in batch:
+        self.quarantine(line, row, {'database': [message]})
+    if self.progress is not None:
+      elapsed = time.perf_counter() - self._started
+      self.progress(self.loaded, self.rejected, elapsed)
+
+  def quarantine(self, line, row, errors):
+    if self._quarantine is None:
+      self._quarantine = open(self.quarantine_path, 'w', encoding='utf-8')
+    self._quarantine.write(json.dumps({'line': line, 'row': row, 'errors': errors}, default=str) + '\n')
+    self.rejected += 1
+
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+def export_batches(session, table, batch_size=5000):
+  # Yields the rows of table as lists of dicts, batch_size rows at a time,
+  # from a server-side cursor: memory use is bounded by the batch size, not
+  # by the size of the table.
+  result = session.connection().execution_options(stream_results=True) \
+    .execute(select(table).order_by(*table.primary_key.columns))
+  for rows in result.partitions(batch_size):
+    yield [dict(row._mapping) for row in rows]
+
+
+def csv_value(value):
+  if isinstance(value, list):
+    return ','.join(value)
+  if isinstance(value, datetime.datetime):
+    return value.isoformat()
+  return value
+
+
+def export_csv(table, batches):
+  # Yields CSV text chunks, one per batch, after a header line. Genres are
+  # written as one comma-separated cell, as the importer reads them.
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  columns = [column.name for column in table.columns]
+  writer.writerow(columns)
+  for batch in batches:
+    for row in batch:
+      writer.writerow([csv_value(row[column]) for column in columns])
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+  if buffer.tell():
+    yield buffer.getvalue()
+
+
+def export_jsonl(batches, dumps):
+  # Yields JSON Lines chunks, one per batch.
+  for batch in batches:
+    yield b''.join(dumps(row) + b'\n' for row in batch)
+
+
+def parquet_schema(table):
+  import pyarrow
+  from sqlalchemy import ARRAY, Boolean, DateTime, Integer
+
+  def arrow_type(column_type):
+    if isinstance(column_type, ARRAY):
+      return pyarrow.list_(pyarrow.string())
+    if isinstance(column_type, Integer):
+      return pyarrow.int64()
+    if isinstance(column_type, Boolean):
+      return pyarrow.bool_()
+    if isinstance(column_type, DateTime):
+      return pyarrow.timestamp('us', tz='UTC' if column_type.timezone else None)
+    return pyarrow.string()
+
+  return pyarrow.schema([(column.name, arrow_type(column.type)) for column in table.columns])
+
+
+def export_parquet(table, batches, path):
+  # Writes one Parquet row group per batch to path. Needs pyarrow.
+  import pyarrow
+  import pyarrow.parquet
+
+  schema = parquet_schema(table)
+  with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+    for batch in batches:
+      writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
@@ -0,0 +1,227 @@
+#----------------------------------------------------------------------------#
+# View data cache.
+#----------------------------------------------------------------------------#
+
+import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from routing import current_replica
+
+
+class LRUBackend(object):
+  # In-process cache bounded to max_entries, evicting the least recently used
+  # entry. Each worker process has its own copy.
+
+  def __init__(self, max_entries):
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+    self._generations = {}
+    self._settling = {}
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      value, expires = entry
+      if expires < time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl):
+    with self._lock:
+      self._entries[key] = (value, time.monotonic() + ttl)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def generations(self, namespaces):
+    with self._lock:
+      return [self._generations.get(namespace, 0) for namespace in namespaces]
+
+  def bump(self, namespace, settle=0):
+    with self._lock:
+      self._generations[namespace] = self._generations.get(namespace, 0) + 1
+      if settle:
+        self._settling[namespace] = time.monotonic() + settle
+
+  def settling(self, namespaces):
+    # Whether a namespace was bumped within the settle seconds given to bump().
+    now = time.monotonic()
+    with self._lock:
+      return any(self._settling.get(namespace, 0) > now for namespace in namespaces)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._generations.clear()
+      self._settling.clear()
+
+
+class RedisBackend(object):
+  # Cache shared by every worker, on any server speaking the Redis protocol.
+
+  def __init__(self, url, prefix):
+    import redis
+    self._client = redis.Redis.from_url(url)
+    self._prefix = prefix
+
+  def get(self, key):
+    value = self._client.get(self._prefix + key)
+    return pickle.loads(value) if value is not None else None
+
+  def set(self, key, value, ttl):
+    self._client.setex(self._prefix + key, ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+  def generations(self, namespaces):
+    if not namespaces:
+      return []
+    values = self._client.mget([self._prefix + 'generation:' + namespace for namespace in namespaces])
+    return [int(value) if value is not None else 0 for value in values]
+
+  def bump(self, namespace, settle=0):
+    pipeline = self._client.pipeline()
+    pipeline.incr(self._prefix + 'generation:' + namespace)
+    if settle:
+      pipeline.set(self._prefix + 'settling:' + namespace, 1, ex=settle)
+    pipeline.execute()
+
+  def settling(self, namespaces):
+    if not namespaces:
+      return False
+    return self._client.exists(*[self._prefix + 'settling:' + namespace for namespace in namespaces]) > 0
+
+  def clear(self):
+    keys = list(self._client.scan_iter(self._prefix + '*'))
+    if keys:
+      self._client.delete(*keys)
+
+
+class ViewCache(object):
+  # Caches the data a view renders, keyed by the view arguments and by the
+  # generation of every namespace the data depends on. Invalidating a
+  # namespace bumps its generation, which orphans every entry built from it;
+  # orphaned entries age out through the TTL or LRU eviction. Listeners
+  # added with add_listener get a record_lookup(hit) call for every lookup.
+  #
+  # A replica applies a write some time after the primary, up to
+  # REPLICA_STICKY_SECONDS. Data read from a replica is therefore not stored
+  # while a namespace it depends on was invalidated within that time: it may
+  # predate the write, and would be cached under the new generation.
+
+  def __init__(self):
+    self.backend = None
+    self.default_ttl = 60
+    self.replica_lag = 0
+    self.app = None
+    self.hits = 0
+    self.misses = 0
+    self._lock = threading.Lock()
+    self._listeners = []
+
+  def init_app(self, app):
+    cache_type = app.config['CACHE_TYPE']
+    if cache_type == 'redis':
+      self.backend = RedisBackend(app.config['CACHE_REDIS_URL'], app.config['CACHE_KEY_PREFIX'])
+    elif cache_type == 'lru':
+      self.backend = LRUBackend(app.config['CACHE_MAX_ENTRIES'])
+    else:
+      self.backend = None
+    self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+    self.replica_lag = app.config['REPLICA_STICKY_SECONDS'] if app.config.get('SQLALCHEMY_REPLICA_URIS') else 0
+    self.app = app
+
+  @property
+  def per_process(self):
+    # Whether invalidations only reach this process, as with the LRU backend.
+    return isinstance(self.backend, LRUBackend)
+
+  def add_listener(self, listener):
+    self._listeners.append(listener)
+
+  def cached(self, namespaces, key, producer, ttl=None):
+    # Returns the cached value for key, or stores and returns producer().
+    if self.backend is None:
+      return producer()
+    versioned_key, value = self.lookup(namespaces, key)
+    if value is None:
+      value = producer()
+      self.store(namespaces, versioned_key, value, ttl)
+    return value
+
+  async def cached_async(self, namespaces, key, producer, ttl=None):
+    # cached() for a coroutine function producer, from an event loop. The
+    # calls to a backend over the network run in a thread.
+    if self.backend is None:
+      return await producer()
+    in_process = isinstance(self.backend, LRUBackend)
+    if in_process:
+      versioned_key, value = self.lookup(namespaces, key)
+    else:
+      versioned_key, value = await asyncio.to_thread(self.lookup, namespaces, key)
+    if value is None:
+      value = await producer()
+      if in_process:
+        self.store(namespaces, versioned_key, value, ttl)
+      else:
+        await asyncio.to_thread(self.store, namespaces, versioned_key, value, ttl)
+    return value
+
+  def lookup(self, namespaces, key):
+    # (versioned key, cached value or None) of key.
+    generations = self.backend.generations(namespaces)
+    versioned_key = key + '@' + ','.join(f'{namespace}={generation}' for namespace, generation in zip(namespaces, generations))
+    value = self.backend.get(versioned_key)
+    with self._lock:
+      if value is None:
+        self.misses += 1
+      else:
+        self.hits += 1
+    for listener in self._listeners:
+      listener.record_lookup(value is not None)
+    return versioned_key, value
+
+  def store(self, namespaces, versioned_key, value, ttl=None):
+    # Stores a value produced after lookup() missed, unless it was read from
+    # a replica that may not have the latest write of namespaces yet.
+    if self.replica_lag and current_replica(self.app) is not None and self.backend.settling(namespaces):
+      return
+    self.backend.set(versioned_key, value, ttl or self.default_ttl)
+
+  def invalidate(self, *namespaces):
+    if self.backend is not None:
+      for namespace in set(namespaces):
+        self.backend.bump(namespace, self.replica_lag)
+
+  def invalidate_on_commit(self, session, namespaces_for):
+    # Collects the namespaces of every object flushed by session, through
+    # namespaces_for(obj), and invalidates them once the transaction commits.
+
+    @event.listens_for(session, 'after_flush')
+    def collect_namespaces(db_session, flush_context):
+      pending = db_session.info.setdefault('cache_namespaces', set())
+      for obj in list(db_session.new) + list(db_session.dirty) + list(db_session.deleted):
+        pending.update(namespaces_for(obj))
+
+    @event.listens_for(session, 'after_commit')
+    def invalidate_namespaces(db_session):
+      self.invalidate(*db_session.info.pop('cache_namespaces', ()))
+
+    @event.listens_for(session, 'after_rollback')
+    def discard_namespaces(db_session):
+      db_session.info.pop('cache_namespaces', None)
+
+  def stats(self):
+    with self._lock:
+      return {'hits': self.hits, 'misses': self.misses}
+
+
+view_cache = ViewCache()
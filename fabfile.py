@@ -1,14 +1,29 @@
-from fabric.api import local, settings, abort
+import os
+
+from fabric.api import local, settings, shell_env, abort
 from fabric.contrib.console import confirm
 
 # prepare for deployment
 
+# Benchmark results of this machine, which later runs are compared with.
+# Latencies are only comparable on one machine, so it is not committed.
+BASELINE = 'benchmarks/baseline.json'
+
 
 def test():
-    with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+    # Benchmarks every route, see benchmarks/harness.py. The harness drops and
+    # recreates the tables of BENCHMARK_DATABASE_URL. The first run saves the
+    # baseline; later runs fail on regressions against it.
+    if not os.environ.get('BENCHMARK_DATABASE_URL'):
+        abort("Set BENCHMARK_DATABASE_URL to a scratch database to run the benchmarks.")
+    with shell_env(FYYUR_ENV=os.environ.get('FYYUR_ENV', 'development')):
+        if not os.path.exists(BASELINE):
+            local("python benchmarks/harness.py --save-baseline {}".format(BASELINE))
+            return
+        with settings(warn_only=True):
+            result = local(
+                "python benchmarks/harness.py --baseline {}".format(BASELINE), capture=True
+            )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
@@ -40,7 +55,7 @@ def heroku():
 
 def heroku_test():
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run flask check-indexes && heroku run flask check-show-counters"
     )
 
 
@@ -0,0 +1,69 @@
+#----------------------------------------------------------------------------#
+# Gunicorn settings.
+#----------------------------------------------------------------------------#
+
+#   gunicorn -c gunicorn.conf.py
+#
+# GUNICORN_PRESET picks the worker model:
+#
+#   gthread  (default) WEB_CONCURRENCY processes of GUNICORN_THREADS threads:
+#            threads overlap the database round trips. Keep threads at or
+#            below DB_POOL_SIZE + DB_MAX_OVERFLOW.
+#   sync     one request at a time per process, 2 * cores + 1 processes:
+#            simplest, for CPU-bound loads behind a buffering proxy.
+#   asgi     uvicorn workers serving asgi.py, for many slow or idle
+#            connections; see the README.
+#
+# WEB_CONCURRENCY and GUNICORN_THREADS override the preset's numbers.
+
+import multiprocessing
+import os
+
+cores = multiprocessing.cpu_count()
+
+PRESETS = {
+  'gthread': {'worker_class': 'gthread', 'workers': cores + 1, 'threads': 8, 'wsgi_app': 'wsgi:application'},
+  'sync': {'worker_class': 'sync', 'workers': 2 * cores + 1, 'threads': 1, 'wsgi_app': 'wsgi:application'},
+  'asgi': {'worker_class': 'uvicorn.workers.UvicornWorker', 'workers': cores + 1, 'threads': 1, 'wsgi_app': 'asgi:application'},
+}
+preset = PRESETS[os.environ.get('GUNICORN_PRESET', 'gthread')]
+
+bind = os.environ.get('GUNICORN_BIND', f'0.0.0.0:{os.environ.get("PORT", 8000)}')
+wsgi_app = preset['wsgi_app']
+worker_class = preset['worker_class']
+workers = int(os.environ.get('WEB_CONCURRENCY', preset['workers']))
+threads = int(os.environ.get('GUNICORN_THREADS', preset['threads']))
+
+# Import the app and compile its templates once, in the master, and fork the
+# workers from it: faster boots and copy-on-write shared memory. Without
+# preloading (GUNICORN_PRELOAD=false) each worker imports the app itself,
+# which lets a HUP reload pick up new code.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then, staggered, to bound slow memory growth
+max_requests = 5000
+max_requests_jitter = 500
+
+
+def on_starting(server):
+  # Each worker would have its own 'lru' view cache, which a write handled
+  # by another worker, or a flask command, does not invalidate.
+  from app import app
+  if server.cfg.workers > 1 and app.config['CACHE_TYPE'] == 'lru':
+    raise RuntimeError(f'CACHE_TYPE=lru is per process and {server.cfg.workers} workers would serve stale pages: '
+                       'set CACHE_TYPE=redis (or null), or WEB_CONCURRENCY=1')
+
+
+def post_fork(server, worker):
+  from wsgi import after_fork
+  after_fork()
+
+
+def child_exit(server, worker):
+  # Drops the Prometheus files of a dead worker, see metrics.py.
+  if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
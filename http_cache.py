@@ -0,0 +1,58 @@
+#----------------------------------------------------------------------------#
+# HTTP caching of the venue and artist pages.
+#----------------------------------------------------------------------------#
+
+import datetime
+
+from flask import current_app, g, request, session
+from werkzeug.http import is_resource_modified
+
+# Lists the entities a response shows, space-separated, so that a CDN
+# (Fastly, Varnish with xkey) can purge every page showing a changed entity
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+
+
+def entity_etag(key, updated_at):
+  # Version of the page of the entity named key ('venue-1'). RELEASE is part
+  # of it, since a deploy may render the same row differently.
+  version = updated_at.astimezone(datetime.timezone.utc).strftime('%Y%m%d%H%M%S%f')
+  release = current_app.config['RELEASE']
+  return f'{key}-{version}-{release}' if release else f'{key}-{version}'
+
+
+def has_flashes():
+  # Flash messages are shown once, by the next page rendered for the
+  # session, and rendering them removes them: the answer is kept for the
+  # whole request. The session is only read when the request has a cookie,
+  # so that anonymous responses do not vary on Cookie.
+  if 'has_flashes' not in g:
+    g.has_flashes = current_app.session_cookie_name in request.cookies and '_flashes' in session
+  return g.has_flashes
+
+
+def not_modified_response(key, updated_at):
+  # Bodiless 304 when the request's If-None-Match or If-Modified-Since
+  # still matches updated_at, the current version of the entity; None when
+  # the page has to be rendered. It carries no Surrogate-Key: a cache keeps
+  # the stored page's keys, those of every entity the page shows, whereas a
+  # 304 only knows the page's own.
+  if has_flashes() or is_resource_modified(request.environ, entity_etag(key, updated_at), last_modified=updated_at):
+    return None
+  response = current_app.response_class(status=304)
+  return add_cache_headers(response, key, updated_at)
+
+
+def add_cache_headers(response, key, updated_at, surrogate_keys=None):
+  # Validators and caching policy of a page rendered from the entity's row
+  # as of updated_at. Browsers revalidate after HTTP_CACHE_MAX_AGE seconds,
+  # shared caches after HTTP_CACHE_SHARED_MAX_AGE unless purged sooner.
+  if has_flashes():
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+  response.set_etag(entity_etag(key, updated_at), weak=True)
+  response.last_modified = updated_at
+  response.headers['Cache-Control'] = (f'public, max-age={current_app.config["HTTP_CACHE_MAX_AGE"]}, '
+                                       f's-maxage={current_app.config["HTTP_CACHE_SHARED_MAX_AGE"]}')
+  if surrogate_keys is not None:
+    response.headers[SURROGATE_KEY_HEADER] = ' '.join(surrogate_keys)
+  return response
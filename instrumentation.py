@@ -0,0 +1,161 @@
+#----------------------------------------------------------------------------#
+# SQL query instrumentation.
+#----------------------------------------------------------------------------#
+
+import json
+import logging
+import time
+from collections import Counter
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements a plain EXPLAIN (without ANALYZE) accepts
+EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+
+class RequestQueries(object):
+  # Statements run while handling one request.
+
+  def __init__(self):
+    self.started = time.perf_counter()
+    self.count = 0
+    self.total = 0.0
+    self.timings = []
+    self.statements = Counter()
+
+  def record(self, statement, elapsed):
+    self.count += 1
+    self.total += elapsed
+    self.timings.append((elapsed, statement))
+    self.statements[statement] += 1
+
+  def slowest(self, number):
+    return sorted(self.timings, key=lambda timing: timing[0], reverse=True)[:number]
+
+  def repeated(self, threshold):
+    return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+class QueryInstrumentation(object):
+  # Times every statement sent by any engine. During a request it counts the
+  # statements and their total time, reports them in a Server-Timing header
+  # and a JSON log line, and warns about statements repeated
+  # SQL_N_PLUS_ONE_THRESHOLD times or more, the usual sign of an N+1 query.
+  # Statements slower than SQL_SLOW_QUERY_MS are logged with their plan,
+  # in requests and commands alike. Listeners added with add_listener get a
+  # record_request(queries) call once a request's statements are all known.
+
+  def __init__(self, app=None):
+    self.logger = None
+    self.slow_query_seconds = None
+    self.explain = True
+    self.n_plus_one_threshold = 0
+    self.slowest_logged = 5
+    self._listeners = []
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    if not app.config['SQL_INSTRUMENTATION']:
+      return
+    self.logger = app.logger.getChild('sql')
+    slow_query_ms = app.config['SQL_SLOW_QUERY_MS']
+    self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms else None
+    self.explain = app.config['SQL_SLOW_QUERY_EXPLAIN']
+    self.n_plus_one_threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+    self.slowest_logged = app.config['SQL_SLOWEST_LOGGED']
+
+    event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+    event.listen(Engine, 'handle_error', self.handle_error)
+    app.before_request(self.start_request)
+    app.after_request(self.finish_request)
+
+  def add_listener(self, listener):
+    self._listeners.append(listener)
+
+  def start_request(self):
+    g.sql_queries = RequestQueries()
+
+  def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+  def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    queries = g.get('sql_queries') if has_app_context() else None
+    if queries is not None:
+      queries.record(statement, elapsed)
+    if self.slow_query_seconds is not None and elapsed >= self.slow_query_seconds:
+      plan = self.explain_plan(conn, statement, parameters) if self.explain and not executemany else None
+      self.log(logging.WARNING, 'slow_query', duration_ms=round(elapsed * 1000, 3), statement=statement, plan=plan)
+
+  def handle_error(self, context):
+    # A statement that fails never reaches after_cursor_execute: drop its start
+    # time, or the connection would keep it once back in the pool.
+    if context.connection is not None and context.execution_context is not None:
+      started = context.connection.info.get('query_started')
+      if started:
+        started.pop()
+
+  def explain_plan(self, conn, statement, parameters):
+    # Plan of a statement that just ran, from a raw cursor on the same DBAPI
+    # connection so the EXPLAIN itself is not instrumented. A savepoint keeps
+    # a failing EXPLAIN from aborting the surrounding transaction.
+    if not statement.lstrip().lower().startswith(EXPLAINABLE):
+      return None
+    explain_cursor = conn.connection.cursor()
+    try:
+      explain_cursor.execute('SAVEPOINT explain_slow_query')
+      try:
+        explain_cursor.execute('EXPLAIN ' + statement, parameters)
+        return '\n'.join(row[0] for row in explain_cursor.fetchall())
+      except Exception as error:
+        explain_cursor.execute('ROLLBACK TO SAVEPOINT explain_slow_query')
+        return f'EXPLAIN failed: {error}'.strip()
+      finally:
+        explain_cursor.execute('RELEASE SAVEPOINT explain_slow_query')
+    except Exception:
+      # e.g. no transaction to hold a savepoint
+      return None
+    finally:
+      explain_cursor.close()
+
+  def finish_request(self, response):
+    queries = g.get('sql_queries')
+    if queries is None:
+      return response
+    details = dict(method=request.method, path=request.path, endpoint=request.endpoint, status=response.status_code)
+    if response.is_streamed:
+      # The body is generated after this hook, with statements of its own
+      # (see streaming.py), so the request is reported once it is sent. Its
+      # headers are already gone by then: it gets no Server-Timing.
+      response.call_on_close(lambda: self.report(queries, **details))
+      return response
+    db_ms, request_ms = self.report(queries, **details)
+    response.headers.add('Server-Timing', f'db;desc="{queries.count} queries";dur={db_ms:.3f}')
+    response.headers.add('Server-Timing', f'app;dur={request_ms:.3f}')
+    return response
+
+  def report(self, queries, method, path, endpoint, status):
+    # Logs a finished request's statements; returns its SQL and total time, in ms.
+    db_ms = queries.total * 1000
+    request_ms = (time.perf_counter() - queries.started) * 1000
+    self.log(logging.INFO, 'request_queries', method=method, path=path, endpoint=endpoint,
+             status=status, queries=queries.count, db_ms=round(db_ms, 3), duration_ms=round(request_ms, 3),
+             slowest=[{'duration_ms': round(elapsed * 1000, 3), 'statement': statement}
+                      for elapsed, statement in queries.slowest(self.slowest_logged)])
+
+    if self.n_plus_one_threshold:
+      for statement, count in queries.repeated(self.n_plus_one_threshold):
+        self.log(logging.WARNING, 'repeated_query', method=method, path=path, endpoint=endpoint,
+                 count=count, statement=statement)
+    for listener in self._listeners:
+      listener.record_request(queries)
+    return db_ms, request_ms
+
+  def log(self, level, event_name, **fields):
+    # One JSON object per line, built only when the level is enabled.
+    if self.logger.isEnabledFor(level):
+      self.logger.log(level, json.dumps(dict(event=event_name, **fields), default=str))
@@ -0,0 +1,137 @@
+#----------------------------------------------------------------------------#
+# Prometheus metrics.
+#----------------------------------------------------------------------------#
+
+import functools
+import os
+import time
+
+from flask import Response, g, request, before_render_template, template_rendered
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+# Label of requests that matched no route
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+REQUEST_DURATION = Histogram(
+  'fyyur_request_duration_seconds', 'Time spent handling a request, by endpoint.',
+  ['endpoint', 'method'])
+REQUESTS = Counter(
+  'fyyur_requests_total', 'Requests handled, by endpoint and response status.',
+  ['endpoint', 'method', 'status'])
+REQUESTS_IN_PROGRESS = Gauge(
+  'fyyur_requests_in_progress', 'Requests being handled.',
+  multiprocess_mode='livesum')
+REQUEST_DB_DURATION = Histogram(
+  'fyyur_request_db_duration_seconds', 'Time spent in SQL statements per request, by endpoint.',
+  ['endpoint'])
+REQUEST_QUERIES = Histogram(
+  'fyyur_request_queries', 'SQL statements per request, by endpoint.',
+  ['endpoint'], buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+TEMPLATE_RENDER_DURATION = Histogram(
+  'fyyur_template_render_seconds', 'Time spent rendering a template.',
+  ['template'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+
+POOL_CONNECTIONS_IN_USE = Gauge(
+  'fyyur_db_pool_connections_in_use', 'Database connections checked out of the pool.',
+  multiprocess_mode='livesum')
+POOL_CHECKOUT_WAIT = Histogram(
+  'fyyur_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.',
+  buckets=(.0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5, 30))
+POOL_OVERFLOWS = Counter(
+  'fyyur_db_pool_overflows_total', 'Checkouts that opened an overflow connection.')
+POOL_TIMEOUTS = Counter(
+  'fyyur_db_pool_timeouts_total', 'Checkouts that timed out waiting for a connection.')
+
+CACHE_LOOKUPS = Counter(
+  'fyyur_view_cache_lookups_total', 'View cache lookups, by result.',
+  ['result'])
+
+
+def multiprocess_mode():
+  # Gunicorn workers share metrics through files in PROMETHEUS_MULTIPROC_DIR.
+  return 'PROMETHEUS_MULTIPROC_DIR' in os.environ or 'prometheus_multiproc_dir' in os.environ
+
+
+class PrometheusMetrics(object):
+  # Records request, template, connection pool and view cache metrics.
+  # Without PROMETHEUS_MULTIPROC_DIR the metrics live in this process only;
+  # with it, every worker writes them to shared files and any worker's
+  # response() aggregates all of them.
+
+  def init_app(self, app, pool_stats, view_cache):
+    app.before_request(self.start_request)
+    app.after_request(self.record_response)
+    app.teardown_request(self.finish_request)
+    before_render_template.connect(self.start_render, app)
+    template_rendered.connect(self.finish_render, app)
+    event.listen(Pool, 'checkout', self.record_pool_checkout)
+    event.listen(Pool, 'checkin', self.record_pool_checkin)
+    pool_stats.add_listener(self)
+    view_cache.add_listener(self)
+
+  def start_request(self):
+    g.metrics_started = time.perf_counter()
+    g.metrics_in_progress = True
+    REQUESTS_IN_PROGRESS.inc()
+
+  def record_response(self, response):
+    endpoint = request.endpoint or UNMATCHED_ENDPOINT
+    record = functools.partial(self.record_request, endpoint, request.method, str(response.status_code),
+                               g.metrics_started, g.get('sql_queries'))
+    if response.is_streamed:
+      # Measured once the body, generated after this hook, is sent
+      response.call_on_close(record)
+    else:
+      record()
+    return response
+
+  def record_request(self, endpoint, method, status, started, queries):
+    REQUEST_DURATION.labels(endpoint, method).observe(time.perf_counter() - started)
+    REQUESTS.labels(endpoint, method, status).inc()
+    if queries is not None:
+      REQUEST_DB_DURATION.labels(endpoint).observe(queries.total)
+      REQUEST_QUERIES.labels(endpoint).observe(queries.count)
+
+  def finish_request(self, error):
+    if g.pop('metrics_in_progress', False):
+      REQUESTS_IN_PROGRESS.dec()
+
+  def start_render(self, sender, template, context, **extra):
+    g.setdefault('metrics_render_started', []).append(time.perf_counter())
+
+  def finish_render(self, sender, template, context, **extra):
+    started = g.get('metrics_render_started')
+    if started:
+      TEMPLATE_RENDER_DURATION.labels(template.name or '<string>').observe(time.perf_counter() - started.pop())
+
+  def record_pool_checkout(self, dbapi_connection, connection_record, connection_proxy):
+    POOL_CONNECTIONS_IN_USE.inc()
+
+  def record_pool_checkin(self, dbapi_connection, connection_record):
+    POOL_CONNECTIONS_IN_USE.dec()
+
+  def record_checkout(self, wait, overflowed):
+    POOL_CHECKOUT_WAIT.observe(wait)
+    if overflowed:
+      POOL_OVERFLOWS.inc()
+
+  def record_timeout(self):
+    POOL_TIMEOUTS.inc()
+
+  def record_lookup(self, hit):
+    CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+  def response(self):
+    # The metrics in the Prometheus text format.
+    if multiprocess_mode():
+      registry = CollectorRegistry()
+      multiprocess.MultiProcessCollector(registry)
+    else:
+      registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+metrics = PrometheusMetrics()
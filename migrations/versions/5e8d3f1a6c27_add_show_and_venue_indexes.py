@@ -0,0 +1,34 @@
+"""Add show and venue indexes
+
+Revision ID: 5e8d3f1a6c27
+Revises: 9c4e2a7b5d13
+Create Date: 2026-10-18 10:41:06.902517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8d3f1a6c27'
+down_revision = '9c4e2a7b5d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the detail pages filter shows by venue or artist and split them on
+    # start_time; the venue/artist foreign keys also need an index for the
+    # cascading deletes
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+    # keyset pagination of /shows orders on (start_time, id)
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_venue_city_state', 'venue', ['city', 'state'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_city_state', table_name='venue')
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
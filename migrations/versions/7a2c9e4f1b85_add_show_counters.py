@@ -0,0 +1,48 @@
+"""Add show counters
+
+Revision ID: 7a2c9e4f1b85
+Revises: 5e8d3f1a6c27
+Create Date: 2026-10-18 12:20:14.553871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2c9e4f1b85'
+down_revision = '5e8d3f1a6c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('show', sa.Column('is_upcoming', sa.Boolean(), server_default='false', nullable=False))
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute('UPDATE show SET is_upcoming = start_time > now()')
+    for table in ('venue', 'artist'):
+        op.execute(f'''
+            UPDATE {table} SET upcoming_shows_count = counted.upcoming, past_shows_count = counted.past
+            FROM (
+                SELECT {table}_id AS id,
+                    count(*) FILTER (WHERE is_upcoming) AS upcoming,
+                    count(*) FILTER (WHERE NOT is_upcoming) AS past
+                FROM show GROUP BY {table}_id
+            ) AS counted
+            WHERE {table}.id = counted.id
+        ''')
+
+    # lets roll-shows find the shows that have started without scanning the past
+    op.create_index('ix_show_upcoming_start_time', 'show', ['start_time'], unique=False,
+                    postgresql_where=sa.text('is_upcoming'))
+
+
+def downgrade():
+    op.drop_index('ix_show_upcoming_start_time', table_name='show')
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_column('show', 'is_upcoming')
@@ -0,0 +1,81 @@
+"""Store genres as arrays
+
+Revision ID: 9c4e2a7b5d13
+Revises: 3b1f0c7d9a42
+Create Date: 2026-10-18 10:03:51.427310
+
+"""
+import pickle
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e2a7b5d13'
+down_revision = '3b1f0c7d9a42'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def convert_venue_genres(source, target, target_type, convert):
+    # Rewrites venue.<source> into venue.<target> in batches, streaming the
+    # rows so large tables are not loaded at once.
+    conn = op.get_bind()
+    rows = conn.execution_options(stream_results=True).execute(
+        sa.text(f'SELECT id, {source} FROM venue'))
+    update = sa.text(f'UPDATE venue SET {target} = :value WHERE id = :id') \
+        .bindparams(sa.bindparam('value', type_=target_type))
+    while True:
+        batch = rows.fetchmany(BATCH_SIZE)
+        if not batch:
+            break
+        conn.execute(update, [{'id': id, 'value': convert(value)} for id, value in batch])
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('genre_list', postgresql.ARRAY(sa.String(length=120)), nullable=True))
+    op.add_column('artist', sa.Column('genre_list', postgresql.ARRAY(sa.String(length=120)), nullable=True))
+
+    # venue.genres holds pickled lists of genre names
+    convert_venue_genres('genres', 'genre_list', postgresql.ARRAY(sa.String(length=120)),
+                         lambda value: list(pickle.loads(bytes(value))) if value is not None else [])
+
+    # artist.genres holds PostgreSQL array literals such as '{Jazz,"Hip-Hop"}',
+    # or a plain comma-separated list for rows not written through a list
+    op.execute("""
+        UPDATE artist SET genre_list = CASE
+            WHEN genres LIKE '{%}' THEN genres::varchar(120)[]
+            ELSE string_to_array(genres, ',')::varchar(120)[]
+        END
+        WHERE genres IS NOT NULL
+    """)
+
+    op.drop_column('venue', 'genres')
+    op.drop_column('artist', 'genres')
+    op.alter_column('venue', 'genre_list', new_column_name='genres', nullable=False)
+    op.alter_column('artist', 'genre_list', new_column_name='genres')
+
+    op.create_index('ix_venue_genres', 'venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_artist_genres', 'artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_artist_genres', table_name='artist')
+    op.drop_index('ix_venue_genres', table_name='venue')
+
+    op.alter_column('venue', 'genres', new_column_name='genre_list')
+    op.alter_column('artist', 'genres', new_column_name='genre_list')
+    op.add_column('venue', sa.Column('genres', sa.PickleType(), nullable=True))
+    op.add_column('artist', sa.Column('genres', sa.String(length=120), nullable=True))
+
+    convert_venue_genres('genre_list', 'genres', sa.LargeBinary(),
+                         lambda value: pickle.dumps(list(value or [])))
+    op.execute('UPDATE artist SET genres = genre_list::text WHERE genre_list IS NOT NULL')
+
+    op.drop_column('venue', 'genre_list')
+    op.drop_column('artist', 'genre_list')
+    op.alter_column('venue', 'genres', nullable=False)
@@ -0,0 +1,28 @@
+"""Add updated_at to venue and artist
+
+Revision ID: b3d8f2e6a917
+Revises: 7a2c9e4f1b85
+Create Date: 2026-10-18 15:42:37.208114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d8f2e6a917'
+down_revision = '7a2c9e4f1b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows get the time of the migration as their first version
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'),
+                                       nullable=False))
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,27 @@
+"""Add name prefix indexes for the venue and artist lookups
+
+Revision ID: d61a4c8e2f35
+Revises: b3d8f2e6a917
+Create Date: 2026-10-18 17:05:11.482930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd61a4c8e2f35'
+down_revision = 'b3d8f2e6a917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # text_pattern_ops lets lower(name) LIKE 'prefix%' use the index whatever the collation
+    op.create_index('ix_venue_name_prefix', 'venue', [sa.text('lower(name) text_pattern_ops')], unique=False)
+    op.create_index('ix_artist_name_prefix', 'artist', [sa.text('lower(name) text_pattern_ops')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_prefix', table_name='artist')
+    op.drop_index('ix_venue_name_prefix', table_name='venue')
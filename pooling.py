@@ -0,0 +1,126 @@
+#----------------------------------------------------------------------------#
+# Database connection pooling.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+import weakref
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class PoolStats(object):
+  # Process-wide counters for every InstrumentedQueuePool. Listeners added
+  # with add_listener also get each record_checkout and record_timeout call.
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._pools = weakref.WeakSet()
+    self._listeners = []
+    self.checkouts = 0
+    self.checkout_wait_total = 0.0
+    self.checkout_wait_max = 0.0
+    self.overflow_events = 0
+    self.timeouts = 0
+
+  def add_pool(self, pool):
+    self._pools.add(pool)
+
+  def add_listener(self, listener):
+    self._listeners.append(listener)
+
+  def record_checkout(self, wait, overflowed):
+    with self._lock:
+      self.checkouts += 1
+      self.checkout_wait_total += wait
+      self.checkout_wait_max = max(self.checkout_wait_max, wait)
+      if overflowed:
+        self.overflow_events += 1
+    for listener in self._listeners:
+      listener.record_checkout(wait, overflowed)
+
+  def record_timeout(self):
+    with self._lock:
+      self.timeouts += 1
+    for listener in self._listeners:
+      listener.record_timeout()
+
+  def snapshot(self):
+    pools = list(self._pools)
+    with self._lock:
+      return {
+        'pools': len(pools),
+        'size': sum(pool.size() for pool in pools),
+        'in_use': sum(pool.checkedout() for pool in pools),
+        'idle': sum(pool.checkedin() for pool in pools),
+        'overflow': sum(max(pool.overflow(), 0) for pool in pools),
+        'checkouts': self.checkouts,
+        'checkout_wait_seconds_total': self.checkout_wait_total,
+        'checkout_wait_seconds_max': self.checkout_wait_max,
+        'overflow_events': self.overflow_events,
+        'timeouts': self.timeouts,
+      }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+  # QueuePool that records how long each checkout waited, and whether it had
+  # to open an overflow connection, in pool_stats.
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    pool_stats.add_pool(self)
+
+  def _do_get(self):
+    started = time.perf_counter()
+    overflow_before = self._overflow
+    try:
+      connection = super()._do_get()
+    except exc.TimeoutError:
+      pool_stats.record_timeout()
+      raise
+    pool_stats.record_checkout(time.perf_counter() - started, self._overflow > max(overflow_before, 0))
+    return connection
+
+
+def engine_options(config):
+  # Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings in config.py.
+  options = {
+    'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    'pool_recycle': config['DB_POOL_RECYCLE'],
+  }
+  statement_timeout = config['DB_STATEMENT_TIMEOUT_MS']
+
+  if config['DB_PGBOUNCER']:
+    # PgBouncer in transaction mode does the pooling and hands each transaction
+    # to any server connection: keep no client-side pool, send no startup
+    # options, and scope the statement timeout to the transaction instead.
+    # psycopg2 never uses server-side prepared statements.
+    options['poolclass'] = NullPool
+    options['execution_options'] = {'statement_timeout_ms': statement_timeout}
+  else:
+    options.update({
+      'poolclass': InstrumentedQueuePool,
+      'pool_size': config['DB_POOL_SIZE'],
+      'max_overflow': config['DB_MAX_OVERFLOW'],
+      'pool_timeout': config['DB_POOL_TIMEOUT'],
+    })
+    if statement_timeout:
+      options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+
+  return options
+
+
+@event.listens_for(Engine, 'begin')
+def set_transaction_statement_timeout(conn):
+  # Applies the PgBouncer-mode statement timeout to each new transaction.
+  # The raw DBAPI cursor keeps this out of the statement events.
+  statement_timeout = conn.get_execution_options().get('statement_timeout_ms')
+  if statement_timeout:
+    cursor = conn.connection.cursor()
+    cursor.execute(f'SET LOCAL statement_timeout = {int(statement_timeout)}')
+    cursor.close()
@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+import random
+import time
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+
+# Requests with these methods never write, so their queries can go to a replica
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(SignallingSession):
+  # Sends the queries of read-only requests to one of the replica binds listed
+  # in SQLALCHEMY_REPLICA_BINDS; everything else uses the primary database.
+
+  def __init__(self, db, **options):
+    self.db = db
+    super().__init__(db, **options)
+
+  def get_bind(self, mapper=None, clause=None):
+    replica = None if self._flushing else current_replica(self.app)
+    if replica is not None:
+      return self.db.get_engine(self.app, bind=replica)
+    return super().get_bind(mapper, clause)
+
+
+def current_replica(app):
+  # One replica is picked per request, so a request reads from a single
+  # snapshot. Writes and the requests shortly after a write (see
+  # REPLICA_STICKY_SECONDS) use the primary, so users read their own writes.
+  replicas = app.config['SQLALCHEMY_REPLICA_BINDS']
+  if not replicas or not has_request_context():
+    return None
+  if 'db_replica' not in g:
+    sticky = session.get('db_primary_until', 0) > time.time()
+    use_replica = request.method in READ_METHODS and not sticky
+    g.db_replica = random.choice(replicas) if use_replica else None
+  return g.db_replica
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  # SQLAlchemy extension whose session routes reads to replicas. Replicas are
+  # configured as SQLALCHEMY_REPLICA_URIS and registered as the binds
+  # replica_0, replica_1, ...
+
+  def init_app(self, app):
+    replica_uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    replica_binds = [f'replica_{index}' for index in range(len(replica_uris))]
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {}, **dict(zip(replica_binds, replica_uris)))
+    app.config['SQLALCHEMY_REPLICA_BINDS'] = replica_binds
+    super().init_app(app)
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+      if g.pop('db_wrote', False) and replica_binds:
+        session['db_primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+      return response
+
+  def dispose_engines(self, app):
+    # Drops the pooled connections of the primary and replica engines without
+    # closing them, for a forked worker: the connections belong to the parent.
+    for bind in [None] + app.config['SQLALCHEMY_REPLICA_BINDS']:
+      self.get_engine(app, bind=bind).dispose(close=False)
+
+  def create_session(self, options):
+    factory = orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    @event.listens_for(factory, 'after_flush')
+    def record_write(db_session, flush_context):
+      if has_request_context():
+        g.db_wrote = True
+
+    return factory
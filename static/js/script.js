@@ -2,3 +2,57 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Suggestions for the inputs with a data-lookup URL (the show form's artist
+// and venue): as the user types a name, the matches are fetched from the
+// lookup API and listed in the input's <datalist>, each option holding the ID.
+(function () {
+  var DELAY_MS = 150;
+  var MIN_LENGTH = 2;
+
+  function lookup(input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var cache = {};
+    var timer = null;
+    var latest = '';
+
+    function fill(results) {
+      list.textContent = '';
+      results.forEach(function (result) {
+        var option = document.createElement('option');
+        option.value = result.id;
+        option.label = result.name + ' (' + result.city + ', ' + result.state + ')';
+        list.appendChild(option);
+      });
+    }
+
+    function fetchSuggestions(prefix) {
+      if (cache[prefix]) {
+        fill(cache[prefix]);
+        return;
+      }
+      fetch(input.dataset.lookup + '?q=' + encodeURIComponent(prefix))
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          cache[prefix] = data.results;
+          // A slower answer for an earlier prefix must not replace the current one
+          if (prefix === latest) {
+            fill(data.results);
+          }
+        });
+    }
+
+    input.addEventListener('input', function () {
+      var prefix = input.value.trim().toLowerCase();
+      clearTimeout(timer);
+      // An ID was typed or picked from the list: nothing to suggest
+      if (prefix.length < MIN_LENGTH || /^\d+$/.test(prefix)) {
+        return;
+      }
+      latest = prefix;
+      timer = setTimeout(function () { fetchSuggestions(prefix); }, DELAY_MS);
+    });
+  }
+
+  document.querySelectorAll('input[data-lookup]').forEach(lookup);
+})();
@@ -0,0 +1,90 @@
+#----------------------------------------------------------------------------#
+# Streamed HTML pages.
+#----------------------------------------------------------------------------#
+
+from flask import (Response, before_render_template, current_app, get_flashed_messages, request,
+                   stream_with_context, template_rendered)
+
+# Rows fetched per round trip from the server-side cursor of a streamed page
+STREAM_BATCH_SIZE = 100
+
+# Template output is sent in chunks of about this many characters, rather
+# than one write per text node. Smaller than the layout's head, so that the
+# stylesheet and script links leave before the page's rows are fetched.
+STREAM_CHUNK_SIZE = 2048
+
+
+class StreamedPage(object):
+  # One page of a keyset-paginated listing, rendered while its rows are
+  # fetched from a server-side cursor. The template iterates page.<field>
+  # once; page.next_after is known once that is done. present(rows) turns
+  # the page's rows into the items the template iterates. When the listing
+  # is complete, store gets it as the page dict the non-streamed views
+  # cache: {field: items, 'next_after': ...}.
+
+  def __init__(self, field, query, limit, cursor, present, store=None):
+    self.next_after = None
+    self._field = field
+    self._query = query
+    self._limit = limit
+    self._cursor = cursor
+    self._store = store
+    setattr(self, field, self._items(present))
+
+  def _rows(self):
+    # The page's rows; the one past it only tells that a next page exists.
+    last = None
+    for index, row in enumerate(self._query.limit(self._limit + 1).yield_per(STREAM_BATCH_SIZE)):
+      if index == self._limit:
+        self.next_after = self._cursor(last)
+        break
+      last = row
+      yield row
+
+  def _items(self, present):
+    items = [] if self._store is not None else None
+    for item in present(self._rows()):
+      if items is not None:
+        items.append(item)
+      yield item
+    if items is not None:
+      self._store({self._field: items, 'next_after': self.next_after})
+
+
+def chunks(pieces, size=STREAM_CHUNK_SIZE):
+  # Joins the pieces into strings of at least size characters, but the last.
+  buffered = []
+  length = 0
+  for piece in pieces:
+    buffered.append(piece)
+    length += len(piece)
+    if length >= size:
+      yield ''.join(buffered)
+      buffered = []
+      length = 0
+  if buffered:
+    yield ''.join(buffered)
+
+
+def stream_template(template_name, **context):
+  # Like render_template, but the response body is generated while it is
+  # sent, within the request context, so the template can read a
+  # StreamedPage. The statements run while generating are reported when the
+  # response is closed, see QueryInstrumentation.finish_request. The template
+  # signals are sent around the generation, as render_template does.
+  #
+  # The session is saved before the body is generated, so the flash messages
+  # are taken from it here, where removing them still reaches the cookie; the
+  # layout then gets them from the request context.
+  if current_app.session_cookie_name in request.cookies:
+    get_flashed_messages()
+  app = current_app._get_current_object()
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+
+  def generate():
+    before_render_template.send(app, template=template, context=context)
+    yield from chunks(template.generate(context))
+    template_rendered.send(app, template=template, context=context)
+
+  return Response(stream_with_context(generate()), mimetype='text/html')
@@ -0,0 +1,57 @@
+#----------------------------------------------------------------------------#
+# Template compilation and fragment caching.
+#----------------------------------------------------------------------------#
+
+import os
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class FragmentCacheExtension(Extension):
+  # Adds a {% cache %} tag whose body is rendered once per key and then served
+  # from the view cache:
+  #
+  #   {% cache 'venue-shows', venue.id, venue.updated_at %}...{% endcache %}
+  #
+  # Nothing invalidates a fragment, so the key must hold everything the body
+  # depends on, typically an entity id and its updated_at version. The
+  # template name and RELEASE are added to it, so a deploy never serves
+  # fragments of the previous templates.
+  tags = {'cache'}
+
+  def __init__(self, environment):
+    super().__init__(environment)
+    environment.extend(fragment_cache=None, fragment_cache_ttl=None, fragment_cache_release='')
+
+  def parse(self, parser):
+    lineno = next(parser.stream).lineno
+    parts = [parser.parse_expression()]
+    while parser.stream.skip_if('comma'):
+      parts.append(parser.parse_expression())
+    body = parser.parse_statements(('name:endcache',), drop_needle=True)
+    call = self.call_method('_render', [nodes.Const(parser.name), nodes.List(parts)])
+    return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+  def _render(self, template_name, parts, caller):
+    cache = self.environment.fragment_cache
+    if cache is None:
+      return caller()
+    key = ':'.join(['fragment', self.environment.fragment_cache_release, template_name or ''] + [str(part) for part in parts])
+    return Markup(cache.cached((), key, caller, self.environment.fragment_cache_ttl))
+
+
+def init_templates(app, cache):
+  # Stores compiled templates in TEMPLATE_CACHE_DIR, where every worker and
+  # every later process loads them instead of compiling the sources again,
+  # and enables {% cache %} fragments in cache when TEMPLATE_FRAGMENT_CACHE is set.
+  directory = app.config['TEMPLATE_CACHE_DIR']
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+  app.jinja_env.add_extension(FragmentCacheExtension)
+  if app.config['TEMPLATE_FRAGMENT_CACHE']:
+    app.jinja_env.fragment_cache = cache
+  app.jinja_env.fragment_cache_ttl = app.config['TEMPLATE_FRAGMENT_TTL']
+  app.jinja_env.fragment_cache_release = app.config['RELEASE']
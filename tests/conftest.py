@@ -0,0 +1,76 @@
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#----------------------------------------------------------------------------#
+
+# The tests run the app against TEST_DATABASE_URL, a PostgreSQL database
+# they may empty: it is migrated to the latest revision, and its tables are
+# truncated before each test. Without it, the tests are skipped.
+
+import logging
+import os
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+@pytest.fixture(scope='session')
+def database_url():
+  if not TEST_DATABASE_URL:
+    pytest.skip('TEST_DATABASE_URL is not set')
+  return TEST_DATABASE_URL
+
+
+@pytest.fixture(scope='session')
+def app(database_url):
+  # config.py reads the environment when the app is imported
+  os.environ.update(FYYUR_ENV='development', DATABASE_URL=database_url, DATABASE_REPLICA_URLS='', CACHE_TYPE='lru')
+  from app import app as flask_app
+  from flask_migrate import upgrade
+  flask_app.config['TESTING'] = True
+  with flask_app.app_context():
+    upgrade()
+  # migrations/env.py configures logging, which disables the app's loggers
+  for name, logger in logging.root.manager.loggerDict.items():
+    if name.split('.')[0] == flask_app.logger.name and isinstance(logger, logging.Logger):
+      logger.disabled = False
+  return flask_app
+
+
+@pytest.fixture
+def db(app):
+  from app import db as database
+  from cache import view_cache
+  with app.app_context():
+    database.session.execute('TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+    database.session.commit()
+    view_cache.backend.clear()
+    yield database
+    database.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+  return app.test_client()
+
+
+@pytest.fixture
+def count_queries(db):
+  # count_queries(function) calls function and returns the number of SQL
+  # statements it ran, with its result.
+  from sqlalchemy import event
+
+  def count(function):
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+      statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+      result = function()
+    finally:
+      event.remove(db.engine, 'before_cursor_execute', record)
+    return len(statements), result
+
+  return count
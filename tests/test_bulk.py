@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+@pytest.mark.parametrize('table, model_name', [('venues', 'Venue'), ('artists', 'Artist')])
+def test_export_imports_back(app, db, tmp_path, fmt, table, model_name):
+  import app as fyyur
+  model = getattr(fyyur, model_name)
+  fields = dict(name='The Name', genres=['Jazz', 'Folk'], city='San Francisco', state='CA', phone='555-0100',
+                website='https://example.com', facebook_link='https://www.facebook.com/example',
+                seeking_description='', image_link='')
+  if model is fyyur.Venue:
+    fields.update(address='1 Main Street', seeking_talent=True)
+  else:
+    fields.update(seeking_venue=True)
+  db.session.add(model(**fields))
+  db.session.commit()
+
+  path = str(tmp_path / f'{table}.{fmt}')
+  runner = app.test_cli_runner(mix_stderr=False)
+  result = runner.invoke(args=['export', table, '--format', fmt, '--output', path])
+  assert result.exit_code == 0, result.output
+  db.session.execute('TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+  db.session.commit()
+  result = runner.invoke(args=['import', table, path])
+  assert result.exit_code == 0, result.output
+  assert f'{table}: done, 1 loaded, 0 rejected' in result.output
+
+  imported = db.session.query(model).one()
+  for name, value in fields.items():
+    assert getattr(imported, name) == value, name
@@ -0,0 +1,80 @@
+from flask import Flask
+
+from cache import ViewCache
+
+
+def test_write_is_visible_on_next_read(db, client):
+  from app import Venue
+  db.session.add(Venue(name='The Old Name', genres=['Jazz'], address='1 Main Street', city='San Francisco',
+                       state='CA', phone='555-0100', website='', facebook_link='', seeking_talent=False,
+                       seeking_description='', image_link=''))
+  db.session.commit()
+  for url in ('/venues', '/venues/1'):
+    assert 'The Old Name' in client.get(url, buffered=True).get_data(as_text=True)
+
+  client.post('/venues/1/edit', data={
+    'name': 'The New Name', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main Street',
+    'phone': '555-0100', 'genres': ['Jazz'], 'facebook_link': '', 'website_link': '', 'image_link': '',
+    'seeking_description': '',
+  })
+
+  for url in ('/venues', '/venues/1', '/api/v1/venues', '/api/v1/venues/1'):
+    body = client.get(url, buffered=True).get_data(as_text=True)
+    assert 'The New Name' in body and 'The Old Name' not in body, url
+
+
+def test_replica_reads_are_not_stored_right_after_a_write():
+  # The replica may not have the write yet, so its data must not be cached
+  # under the namespace's new generation.
+  app = Flask(__name__)
+  app.config.update(CACHE_TYPE='lru', CACHE_MAX_ENTRIES=100, CACHE_DEFAULT_TTL=60, REPLICA_STICKY_SECONDS=10,
+                    SQLALCHEMY_REPLICA_URIS=['postgresql://replica/fyyur'], SQLALCHEMY_REPLICA_BINDS=['replica_0'])
+  cache = ViewCache()
+  cache.init_app(app)
+
+  with app.test_request_context('/venues'):
+    assert cache.cached(('venues',), 'venues', lambda: 'before the write') == 'before the write'
+    assert cache.cached(('venues',), 'venues', lambda: 'not read') == 'before the write'
+    cache.invalidate('venues')
+    assert cache.cached(('venues',), 'venues', lambda: 'maybe stale') == 'maybe stale'
+    assert cache.cached(('venues',), 'venues', lambda: 'read again') == 'read again'
+
+  # Reads from the primary are stored at once.
+  with app.test_request_context('/venues', method='POST'):
+    assert cache.cached(('venues',), 'venues', lambda: 'from the primary') == 'from the primary'
+  with app.test_request_context('/venues'):
+    assert cache.cached(('venues',), 'venues', lambda: 'not read') == 'from the primary'
+
+
+def test_commands_warn_when_their_invalidation_stays_in_process(app, db):
+  # The tests use the per-process 'lru' cache, which the web workers would
+  # not share with a flask command.
+  result = app.test_cli_runner(mix_stderr=False).invoke(args=['check-show-counters', '--fix'])
+  assert result.exit_code == 0, result.output
+  assert 'use CACHE_TYPE=redis' in result.stderr
+
+
+
+def test_artist_lookup_follows_rolled_shows(app, db, client):
+  # The lookup puts the artists with the most upcoming shows first, and
+  # roll-shows moves the shows that started to the past.
+  from datetime import datetime, timedelta
+  from app import Artist, Show, Venue
+  venue = Venue(name='The Venue', genres=['Jazz'], address='1 Main Street', city='San Francisco', state='CA',
+                phone='555-0100', website='', facebook_link='', seeking_talent=False, seeking_description='',
+                image_link='')
+  db.session.add_all([
+    Artist(name='Band A', genres=['Jazz']),
+    Show(venue=venue, artist=Artist(name='Band B', genres=['Jazz']), start_time=datetime.now() + timedelta(days=1)),
+  ])
+  db.session.commit()
+
+  def lookup():
+    return [result['name'] for result in client.get('/api/v1/artists/lookup?q=band').get_json()['results']]
+
+  assert lookup() == ['Band B', 'Band A']
+  db.session.execute("UPDATE show SET start_time = now() - interval '1 hour'")
+  db.session.commit()
+  result = app.test_cli_runner(mix_stderr=False).invoke(args=['roll-shows'])
+  assert result.exit_code == 0, result.output
+  assert lookup() == ['Band A', 'Band B']
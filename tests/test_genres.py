@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.fixture
+def genres(db):
+  from app import Artist, Venue
+  for index, genres in enumerate((['Jazz'], ['Rock', 'Jazz'], ['Rock'])):
+    db.session.add(Venue(name=f'Venue {index}', genres=genres, address='1 Main Street', city='San Francisco',
+                         state='CA', phone='555-0100', website='', facebook_link='', seeking_talent=False,
+                         seeking_description='', image_link=''))
+    db.session.add(Artist(name=f'Artist {index}', genres=genres, city='San Francisco', state='CA'))
+  db.session.commit()
+
+
+def test_venues_by_genre(genres, client):
+  areas = client.get('/api/v1/venues?genre=Jazz').get_json()['areas']
+  assert [venue['name'] for area in areas for venue in area['venues']] == ['Venue 0', 'Venue 1']
+  body = client.get('/venues?genre=Jazz', buffered=True).get_data(as_text=True)
+  assert 'Venue 1' in body and 'Venue 2' not in body
+
+
+def test_artists_by_genre(genres, client):
+  artists = client.get('/api/v1/artists?genre=Rock').get_json()['artists']
+  assert [artist['name'] for artist in artists] == ['Artist 1', 'Artist 2']
+  body = client.get('/artists?genre=Rock', buffered=True).get_data(as_text=True)
+  assert 'Artist 1' in body and 'Artist 0' not in body
@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta
+
+
+def test_not_modified_keeps_the_stored_surrogate_keys(db, client):
+  # A cache updates the stored headers of a page from a 304: a 304 naming
+  # only the venue would drop the artists' keys.
+  from app import Artist, Show, Venue
+  venue = Venue(name='The Musical Hop', genres=['Jazz'], address='1 Main Street', city='San Francisco', state='CA',
+                phone='555-0100', website='', facebook_link='', seeking_talent=False, seeking_description='',
+                image_link='')
+  db.session.add(Show(venue=venue, artist=Artist(name='Guns N Petals', genres=['Rock']),
+                      start_time=datetime.now() + timedelta(days=1)))
+  db.session.commit()
+
+  response = client.get('/venues/1')
+  assert response.headers['Surrogate-Key'] == 'venue-1 artist-1'
+  revalidated = client.get('/venues/1', headers={'If-None-Match': response.headers['ETag']})
+  assert revalidated.status_code == 304
+  assert 'Surrogate-Key' not in revalidated.headers
+  assert revalidated.headers['ETag'] == response.headers['ETag']
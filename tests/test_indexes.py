@@ -0,0 +1,5 @@
+def test_hot_queries_use_indexes(app):
+  # flask check-indexes fails when EXPLAIN shows a sequential scan.
+  result = app.test_cli_runner().invoke(args=['check-indexes'])
+  assert result.exit_code == 0, result.output
+  assert 'SEQUENTIAL SCAN' not in result.output
@@ -0,0 +1,10 @@
+import pytest
+from sqlalchemy.exc import ProgrammingError
+
+
+def test_failed_statement_start_time_is_dropped(db):
+  connection = db.session.connection()
+  with pytest.raises(ProgrammingError):
+    connection.execute('SELECT * FROM no_such_table')
+  assert connection.info['query_started'] == []
+  db.session.rollback()
@@ -0,0 +1,81 @@
+# Replica routing, with two schemas of the test database standing in for the
+# primary and a replica: rows written to the primary never reach the replica,
+# like a replica lagging behind forever.
+
+import time
+
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+import routing
+from routing import RoutingSQLAlchemy
+
+SCHEMAS = ('routing_primary', 'routing_replica')
+
+
+def schema_url(database_url, schema):
+  return str(make_url(database_url).update_query_dict({'options': f'-csearch_path={schema}'}))
+
+
+@pytest.fixture
+def routed_app(database_url):
+  engine = create_engine(database_url)
+  with engine.begin() as connection:
+    for schema in SCHEMAS:
+      connection.exec_driver_sql(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+      connection.exec_driver_sql(f'CREATE SCHEMA {schema}')
+      connection.exec_driver_sql(f'CREATE TABLE {schema}.item (id serial PRIMARY KEY, name text NOT NULL)')
+      connection.exec_driver_sql(f"INSERT INTO {schema}.item (name) VALUES ('{schema}')")
+
+  app = Flask(__name__)
+  app.config.update(SECRET_KEY='test', SQLALCHEMY_TRACK_MODIFICATIONS=False, REPLICA_STICKY_SECONDS=10,
+                    SQLALCHEMY_DATABASE_URI=schema_url(database_url, 'routing_primary'),
+                    SQLALCHEMY_REPLICA_URIS=[schema_url(database_url, 'routing_replica')])
+  db = RoutingSQLAlchemy(app)
+
+  class Item(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.Text, nullable=False)
+
+  def names():
+    return sorted(name for name, in db.session.query(Item.name))
+
+  @app.route('/items')
+  def items():
+    return jsonify(names())
+
+  @app.route('/items', methods=['POST'])
+  def create_item():
+    db.session.add(Item(name='written'))
+    db.session.commit()
+    # Read back in the same request
+    return jsonify(names())
+
+  yield app
+  with app.app_context():
+    db.get_engine(app).dispose()
+    db.get_engine(app, bind='replica_0').dispose()
+  with engine.begin() as connection:
+    for schema in SCHEMAS:
+      connection.exec_driver_sql(f'DROP SCHEMA {schema} CASCADE')
+  engine.dispose()
+
+
+def test_reads_go_to_the_replica(routed_app):
+  assert routed_app.test_client().get('/items').get_json() == ['routing_replica']
+
+
+def test_writer_reads_from_the_primary_until_sticky_window_ends(routed_app, monkeypatch):
+  client = routed_app.test_client()
+  written = ['routing_primary', 'written']
+  assert client.post('/items').get_json() == written
+  # Within REPLICA_STICKY_SECONDS, the writer's reads see their write
+  assert client.get('/items').get_json() == written
+  # Other users read from the replica
+  assert routed_app.test_client().get('/items').get_json() == ['routing_replica']
+
+  now = time.time()
+  monkeypatch.setattr(routing.time, 'time', lambda: now + 11)
+  assert client.get('/items').get_json() == ['routing_replica']
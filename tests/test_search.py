@@ -0,0 +1,30 @@
+import pytest
+
+
+@pytest.fixture
+def artists(db):
+  from app import Artist
+  for name in ('Guns N Petals', 'Matt Quevado', 'The Wild Sax Band', 'Bob Dylan', 'Mr. Kitty'):
+    db.session.add(Artist(name=name, genres=['Rock'], city='San Francisco', state='CA'))
+  db.session.commit()
+
+
+@pytest.mark.parametrize('search_term, names', [
+  ('A', ['Bob Dylan', 'Guns N Petals', 'Matt Quevado', 'The Wild Sax Band']),
+  ('band', ['The Wild Sax Band']),
+  ('', ['Bob Dylan', 'Guns N Petals', 'Matt Quevado', 'Mr. Kitty', 'The Wild Sax Band']),
+])
+def test_search_is_partial_and_case_insensitive(artists, client, search_term, names):
+  results = client.get('/api/v1/artists/search', query_string={'search_term': search_term}).get_json()['results']
+  assert [artist['name'] for artist in results['data']] == names
+  assert results['count'] == len(names)
+
+
+def test_search_count_stops_at_limit(app, artists, client):
+  app.config['SEARCH_COUNT_LIMIT'] = 2
+  try:
+    body = client.post('/artists/search', data={'search_term': 'a'}).get_data(as_text=True)
+  finally:
+    app.config['SEARCH_COUNT_LIMIT'] = 1000
+  assert 'Number of search results for "a": 2+' in body
+  assert body.count('<h5>') == 4
@@ -0,0 +1,70 @@
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def add_venues(db, count):
+  # count venues over a few areas, each with an upcoming and a past show of
+  # its own artist.
+  from app import Artist, Show, Venue
+  now = datetime.now()
+  for index in range(count):
+    venue = Venue(name=f'Venue {index}', genres=['Jazz'], address=f'{index} Main Street',
+                  city=f'City {index % 3}', state='CA', phone='555-0100', website='', facebook_link='',
+                  seeking_talent=False, seeking_description='', image_link='')
+    artist = Artist(name=f'Artist {index}', genres=['Jazz'], city='City 0', state='CA')
+    db.session.add_all([
+      Show(venue=venue, artist=artist, start_time=now + timedelta(days=1)),
+      Show(venue=venue, artist=artist, start_time=now - timedelta(days=1)),
+    ])
+  db.session.commit()
+
+
+@pytest.mark.parametrize('url', ['/venues?limit=500', '/api/v1/venues?limit=500'])
+def test_venue_listing_queries_do_not_grow_with_venues(db, client, count_queries, url):
+  from cache import view_cache
+  counts = []
+  for total in (5, 50):
+    db.session.execute('TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+    add_venues(db, total)
+    view_cache.backend.clear()
+    queries, response = count_queries(lambda: client.get(url, buffered=True))
+    counts.append(queries)
+    assert response.status_code == 200
+    assert f'Venue {total - 1}' in response.get_data(as_text=True)
+  assert 0 < counts[0] == counts[1]
+
+
+def test_delete_venue(db, client):
+  add_venues(db, 1)
+  response = client.delete('/venues/1')
+  assert response.status_code == 200
+  assert response.get_json() == {'success': True}
+  assert client.get('/venues/1').status_code == 404
+
+
+@pytest.mark.parametrize('url', ['/venues', '/artists', '/shows'])
+def test_streamed_listing_queries_are_reported(db, client, caplog, url):
+  # The listings run their query while the body streams, after the
+  # after_request hooks: it is logged once the response is closed.
+  add_venues(db, 3)
+  caplog.set_level(logging.INFO, logger='app.sql')
+  client.get(url, buffered=True)
+  reports = [json.loads(record.getMessage()) for record in caplog.records if '"request_queries"' in record.getMessage()]
+  assert [report['path'] for report in reports] == [url]
+  assert reports[0]['queries'] == 1
+
+
+@pytest.mark.parametrize('url', ['/venues', '/artists', '/shows'])
+def test_streamed_listing_head_is_sent_before_the_query(db, client, count_queries, url):
+  add_venues(db, 3)
+  response = client.get(url)
+  body = iter(response.response)
+  head_queries, head = count_queries(lambda: next(body))
+  rest_queries, rest = count_queries(lambda: b''.join(body))
+  response.close()
+  assert b'<head>' in head and head_queries == 0
+  assert b'Venue 2' in rest or b'Artist 2' in rest
+  assert rest_queries == 1
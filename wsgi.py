@@ -0,0 +1,37 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#----------------------------------------------------------------------------#
+
+# Production entry point, e.g. for gunicorn with the settings in
+# gunicorn.conf.py:
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# Runs with the production configuration unless FYYUR_ENV says otherwise.
+# Importing this module does all the start-up work: with gunicorn's
+# preload_app it happens once in the master, and the forked workers share it.
+
+import os
+
+os.environ.setdefault('FYYUR_ENV', 'production')
+
+from app import app, db
+
+
+def compile_templates(app):
+  # Loads every template into the Jinja environment's cache, instead of on
+  # each worker's first request for it. Templates already in the bytecode
+  # cache (TEMPLATE_CACHE_DIR) are not compiled again.
+  for name in app.jinja_env.list_templates(extensions=['html']):
+    app.jinja_env.get_template(name)
+
+
+def after_fork():
+  # Called in each worker after the fork: the pooled database connections
+  # opened before it belong to the master and must not be shared.
+  db.dispose_engines(app)
+
+
+compile_templates(app)
+
+application = app